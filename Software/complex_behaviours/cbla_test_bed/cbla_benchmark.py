@@ -0,0 +1,320 @@
+'''Micro-benchmarks of the learning hot paths of the CBLA engine.
+
+Usage: python cbla_benchmark.py [results file] [baseline file] [regression tolerance]
+
+Each case reports the latency per call and its memory use traced with tracemalloc: the peak memory in use during
+one call (temporaries included), and the blocks and bytes still allocated after the calls, per call.
+tracemalloc traces the memory in use, not the number of allocations, so short-lived allocations only show in the peak.
+All the results are saved to a JSON file. If a baseline file (a results file saved earlier) is given,
+the cases that got slower than the baseline by more than REGRESSION_TOLERANCE are reported as regressions.
+'''
+
+import sys
+import gc
+import json
+import random
+import platform
+import tracemalloc
+from time import perf_counter
+from datetime import datetime
+from collections import OrderedDict
+
+import numpy as np
+
+import cbla_engine
+from cbla_engine.cbla_expert import Expert, KGA
+from cbla_engine.cbla_region_splitter import RegionSplitter
+
+# sensorimotor dimensions (S + M) of the cases
+SM_DIMS = (2, 5, 10, 20)
+# depths of the expert trees (a tree of depth d has about 2^d leaves)
+TREE_DEPTHS = (0, 2, 4, 6)
+# numbers of action candidates for the action selection
+CANDIDATE_NUMS = (10, 100, 1000)
+
+# fraction by which a case can be slower than the baseline before it counts as a regression
+REGRESSION_TOLERANCE = 0.25
+
+# minimum total time of the timed calls of a case
+MIN_TIME = 0.2
+
+
+def get_dims(sm_dim) -> tuple:
+    # (S dimension, M dimension)
+    m_dim = max(1, sm_dim // 4)
+    return sm_dim - m_dim, m_dim
+
+
+class Plant(object):
+
+    """Smooth nonlinear function from SM to S1, with noise, that the experts learn"""
+
+    def __init__(self, sm_dim, seed=0):
+        rand = np.random.RandomState(seed)
+        s_dim, m_dim = get_dims(sm_dim)
+        self.weights = rand.uniform(-2, 2, (sm_dim, s_dim))
+        self.rand = rand
+
+    def sample(self, num_sample=1) -> tuple:
+        SM = self.rand.uniform(0, 1, (num_sample, self.weights.shape[0]))
+        S1 = np.tanh(SM.dot(self.weights)) + self.rand.normal(0, 0.02, (num_sample, self.weights.shape[1]))
+        return SM, S1
+
+
+def build_learner(sm_dim, depth, seed=0, max_exemplars=20000) -> cbla_engine.Learner:
+    '''Learner whose expert tree has grown to the given depth'''
+
+    s_dim, m_dim = get_dims(sm_dim)
+
+    # split whenever a leaf has enough exemplars, regardless of the split quality
+    learner = cbla_engine.Learner((0.0,) * s_dim, (0.0,) * m_dim,
+                                  split_thres=40, mean_err_thres=0.0,
+                                  split_quality_thres_0=float('-inf'), split_quality_decay=0.0)
+    plant = Plant(sm_dim, seed=seed)
+
+    SM_array, S1_array = plant.sample(max_exemplars)
+    for SM, S1 in zip(SM_array, S1_array):
+        if get_tree_depth(learner.expert) >= depth:
+            break
+        SM = tuple(SM)
+        S1 = tuple(S1)
+        S1_predicted = learner.expert_tree.predict(SM[:s_dim], SM[s_dim:])
+        learner.expert_tree.append(SM, S1, tuple(S1_predicted))
+        learner.S = S1
+
+    return learner
+
+
+def get_tree_depth(expert: Expert) -> int:
+    if expert.left is None or expert.right is None:
+        return 0
+    return 1 + max(get_tree_depth(expert.left), get_tree_depth(expert.right))
+
+
+def measure(func, min_time=MIN_TIME) -> OrderedDict:
+    '''Returns the latency (in microseconds) and the memory use of func'''
+
+    # number of calls that takes about min_time
+    num_calls = 1
+    while True:
+        t0 = perf_counter()
+        for _ in range(num_calls):
+            func()
+        elapsed = perf_counter() - t0
+        if elapsed >= min_time or num_calls >= 10**6:
+            break
+        num_calls = max(num_calls * 2, int(num_calls * min_time / max(elapsed, 1e-9)))
+
+    # best of 3
+    times = []
+    for _ in range(3):
+        t0 = perf_counter()
+        for _ in range(num_calls):
+            func()
+        times.append((perf_counter() - t0) / num_calls)
+
+    gc.collect()
+    tracemalloc.start()
+
+    # the most memory in use at once during a single call, above what was in use before
+    current_0 = tracemalloc.get_traced_memory()[0]
+    func()
+    peak = tracemalloc.get_traced_memory()[1] - current_0
+
+    # memory still allocated after a few calls (e.g. growing buffers)
+    num_retained_calls = min(num_calls, 100)
+    snapshot_0 = tracemalloc.take_snapshot()
+    for _ in range(num_retained_calls):
+        func()
+    snapshot_1 = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = snapshot_1.compare_to(snapshot_0, 'filename')
+    retained_blocks = sum(stat.count_diff for stat in stats)
+    retained_bytes = sum(stat.size_diff for stat in stats)
+
+    result = OrderedDict()
+    result['latency_us'] = min(times) * 1e6
+    result['median_latency_us'] = sorted(times)[1] * 1e6
+    result['num_calls'] = num_calls
+    result['peak_bytes'] = peak
+    # net change of the allocated blocks and bytes per call (negative if the calls freed memory)
+    result['retained_blocks_per_call'] = retained_blocks / num_retained_calls
+    result['retained_bytes_per_call'] = retained_bytes / num_retained_calls
+
+    return result
+
+
+def bench_expert_append(sm_dim):
+
+    s_dim, m_dim = get_dims(sm_dim)
+    plant = Plant(sm_dim)
+
+    # never splits, so every call goes to the same leaf
+    expert = Expert(mean_err_thres=float('inf'))
+    SM_array, S1_array = plant.sample(5000)
+    exemplars = [(tuple(SM), tuple(S1)) for SM, S1 in zip(SM_array, S1_array)]
+
+    # fill the training window first
+    for SM, S1 in exemplars[:expert.training_data.maxlen]:
+        expert.append(SM, S1, S1)
+
+    index = [0]
+
+    def append():
+        SM, S1 = exemplars[index[0] % len(exemplars)]
+        index[0] += 1
+        expert.append(SM, S1, S1)
+
+    return measure(append)
+
+
+def bench_expert_train(sm_dim):
+
+    plant = Plant(sm_dim)
+    expert = Expert(mean_err_thres=float('inf'))
+    SM_array, S1_array = plant.sample(expert.training_data.maxlen)
+    for SM, S1 in zip(SM_array, S1_array):
+        expert.training_data.append(SM)
+        expert.training_label.append(S1)
+
+    return measure(expert.train)
+
+
+def bench_region_splitter(sm_dim, num_exemplars):
+
+    plant = Plant(sm_dim)
+    data, label = plant.sample(num_exemplars)
+
+    return measure(lambda: RegionSplitter(data, label))
+
+
+def bench_action_selection(learner, num_candidates):
+
+    m_dim = len(learner.M)
+    M_candidates = np.random.RandomState(0).uniform(0, 1, (num_candidates, m_dim))
+
+    return measure(lambda: learner.action_selection(learner.S, M_candidates))
+
+
+def bench_kga_calc_reward(s_dim):
+
+    kga = KGA(1.0, delta=10, tau=30)
+    rand = np.random.RandomState(0)
+    for _ in range(100):
+        kga.append_error(tuple(rand.uniform(0, 1, s_dim)), tuple(rand.uniform(0, 1, s_dim)))
+
+    return measure(kga.calc_reward)
+
+
+def bench_get_expert_info(learner, snap_shot):
+
+    if snap_shot:
+        return measure(lambda: learner.get_expert_info(snap_shot=True))
+
+    # get_expert_info is called once per learning step, which updates one leaf and its model.
+    # Without marking a leaf as updated again, every call but the first would have nothing to report.
+    leaf_experts = learner.expert_tree.leaf_experts
+    index = [0]
+
+    def get_expert_info():
+        slot = index[0] % len(leaf_experts)
+        index[0] += 1
+        learner.expert_tree.dirty_slots.add(slot)
+        learner.logged_model_coefs.pop(leaf_experts[slot].expert_id, None)
+        learner.get_expert_info()
+
+    return measure(get_expert_info)
+
+
+def run_benchmarks(sm_dims=SM_DIMS, tree_depths=TREE_DEPTHS, candidate_nums=CANDIDATE_NUMS) -> OrderedDict:
+
+    random.seed(0)
+    np.random.seed(0)
+
+    results = OrderedDict()
+
+    def record(case_name, result, **params):
+        result.update(params)
+        results[case_name] = result
+        print('%-55s %12.1f us %12.0f bytes (peak) %10.1f blocks (retained)' %
+              (case_name, result['latency_us'], result['peak_bytes'], result['retained_blocks_per_call']))
+
+    for sm_dim in sm_dims:
+        s_dim, m_dim = get_dims(sm_dim)
+
+        record('expert_append/sm%d' % sm_dim, bench_expert_append(sm_dim), sm_dim=sm_dim)
+        record('expert_train/sm%d' % sm_dim, bench_expert_train(sm_dim), sm_dim=sm_dim)
+        for num_exemplars in (40, 500):
+            record('region_splitter/sm%d/n%d' % (sm_dim, num_exemplars),
+                   bench_region_splitter(sm_dim, num_exemplars), sm_dim=sm_dim, num_exemplars=num_exemplars)
+        record('kga_calc_reward/s%d' % s_dim, bench_kga_calc_reward(s_dim), s_dim=s_dim)
+
+        for depth in tree_depths:
+            learner = build_learner(sm_dim, depth)
+            tree_info = dict(sm_dim=sm_dim, depth=get_tree_depth(learner.expert),
+                             num_leaves=learner.expert_tree.num_leaves)
+
+            for num_candidates in candidate_nums:
+                record('action_selection/sm%d/d%d/c%d' % (sm_dim, depth, num_candidates),
+                       bench_action_selection(learner, num_candidates), num_candidates=num_candidates, **tree_info)
+
+            for snap_shot in (False, True):
+                record('get_expert_info/sm%d/d%d%s' % (sm_dim, depth, '/snapshot' if snap_shot else ''),
+                       bench_get_expert_info(learner, snap_shot), snap_shot=snap_shot, **tree_info)
+
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE) -> list:
+    '''Returns the cases that got slower than the baseline --- [(case_name, baseline latency, latency), ...]'''
+
+    regressions = []
+    for case_name, result in results.items():
+        if case_name not in baseline:
+            continue
+        baseline_latency = baseline[case_name]['latency_us']
+        if result['latency_us'] > baseline_latency * (1 + tolerance):
+            regressions.append((case_name, baseline_latency, result['latency_us']))
+    return regressions
+
+
+if __name__ == "__main__":
+
+    # where the results are saved
+    results_path = 'cbla_benchmark_%s.json' % datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    if len(sys.argv) > 1:
+        results_path = str(sys.argv[1])
+
+    # results to compare to
+    baseline_path = None
+    if len(sys.argv) > 2:
+        baseline_path = str(sys.argv[2])
+
+    # fraction by which a case can be slower than the baseline (timings on a busy machine are noisier)
+    tolerance = REGRESSION_TOLERANCE
+    if len(sys.argv) > 3:
+        tolerance = float(sys.argv[3])
+
+    results = run_benchmarks()
+
+    output = OrderedDict()
+    output['timestamp'] = datetime.now().isoformat()
+    output['python'] = platform.python_version()
+    output['numpy'] = np.__version__
+    output['machine'] = platform.platform()
+    output['results'] = results
+    with open(results_path, 'w') as results_file:
+        json.dump(output, results_file, indent=2)
+    print('Results saved to %s' % results_path)
+
+    if baseline_path:
+        with open(baseline_path, 'r') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+
+        regressions = compare_to_baseline(results, baseline, tolerance=tolerance)
+        for case_name, baseline_latency, latency in regressions:
+            print('REGRESSION %s: %.1f us --> %.1f us' % (case_name, baseline_latency, latency))
+        if regressions:
+            sys.exit(1)
+        print('No regressions against %s' % baseline_path)
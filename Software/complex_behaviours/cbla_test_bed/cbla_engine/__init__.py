@@ -4,4 +4,7 @@ from cbla_engine.cbla_engine import *
 from cbla_engine.cbla_robot import *
 from cbla_engine.cbla_learner import *
 from cbla_engine.cbla_expert import *
-
+from cbla_engine.cbla_expert_tree import *
+from cbla_engine.cbla_fleet_engine import *
+from cbla_engine.cbla_learner_pool import *
+from cbla_engine.cbla_simulation import *
@@ -2,6 +2,8 @@ from copy import copy
 from time import perf_counter
 import threading
 
+import numpy as np
+
 from .cbla_robot import *
 from .cbla_learner import *
 
@@ -48,10 +50,7 @@ class CBLA_Engine(object):
         self.update_count += 1
 
         # save snapshot or not
-        snapshot = False
-        if t0 - self.last_snapshot_t > self.snapshot_interval:
-            snapshot = True
-            self.last_snapshot_t = t0
+        snapshot = self.check_snapshot(t0)
 
         with self.robot_lock:
             # act
@@ -77,21 +76,32 @@ class CBLA_Engine(object):
             S_predicted = self.learner.predict()
 
         # save to data packet
+        return self.make_data_packet(S2, S_predicted, t0, snapshot)
+
+    def check_snapshot(self, t0) -> bool:
+
+        if t0 - self.last_snapshot_t > self.snapshot_interval:
+            self.last_snapshot_t = t0
+            return True
+        return False
+
+    def make_data_packet(self, S2, S_predicted, t0, snapshot=False) -> dict:
 
         data_packet = dict()
         data_packet[DataLogger.packet_time_key] = perf_counter()
         data_packet['step'] = self.update_count
         data_packet['loop_period'] = clock() - t0
-        data_packet['S'] = S2
-        data_packet['M'] = self.M
-        data_packet['S1_predicted'] = S_predicted
-        data_packet['avg_act_val_2'] = self.robot.internal_state['avg_act_val_2'].val
-        data_packet['rel_act_val'] = self.robot.internal_state['rel_act_val'].val
-        data_packet['m_max_val'] = self.robot.internal_state['m_max_val'].val
+        data_packet['S'] = compact_value(S2)
+        data_packet['M'] = compact_value(self.M)
+        data_packet['S1_predicted'] = compact_value(S_predicted)
+        data_packet['avg_act_val_2'] = compact_value(self.robot.internal_state['avg_act_val_2'].val)
+        data_packet['rel_act_val'] = compact_value(self.robot.internal_state['rel_act_val'].val)
+        data_packet['m_max_val'] = compact_value(self.robot.internal_state['m_max_val'].val)
 
-        data_packet.update(self.learner.info)
+        for name, val in self.learner.info.items():
+            data_packet[name] = compact_value(val)
 
-        # save expert info to data_packet
+        # save expert info to data_packet (the leaves updated in this step, or all of them in snapshots)
         expert_info = self.learner.get_expert_info(snap_shot=snapshot)
         data_packet.update(expert_info)
 
@@ -106,6 +116,15 @@ class CBLA_Engine(object):
 
         print(print_str + '\n')
 
+def compact_value(val):
+    '''Converts numpy scalars, and tuples or lists of them, to plain Python numbers for the data packets'''
+
+    if isinstance(val, np.generic):
+        return val.item()
+    if isinstance(val, (tuple, list)):
+        return type(val)(v.item() if isinstance(v, np.generic) else v for v in val)
+    return val
+
 def copy_var_list(var_list: list) -> list:
 
     copied_list = []
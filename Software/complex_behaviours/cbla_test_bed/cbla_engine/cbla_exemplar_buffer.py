@@ -0,0 +1,100 @@
+__author__ = 'Matthew'
+
+import numpy as np
+
+
+class ExemplarBuffer():
+
+    """
+    Fixed-capacity circular buffer of exemplars (rows of the same length) backed by a preallocated array.
+
+    Like a deque with maxlen, appending to a full buffer pushes out the oldest exemplar.
+    Every row is written twice, at i and at i + maxlen, so that the exemplars in the buffer are always
+    one contiguous slice of the array. The array property returns that slice as a view (oldest first)
+    without copying, and it can be passed directly to the prediction model or the region splitter.
+    The array is allocated on the first append, when the length of the rows is known.
+    """
+
+    def __init__(self, maxlen, dim=None):
+
+        self.maxlen = int(maxlen)
+        self.__storage = None
+        self.__head = 0
+        self.__count = 0
+
+        if dim is not None:
+            self.__allocate(dim)
+
+    def __allocate(self, dim):
+        self.__storage = np.zeros((2*self.maxlen, dim))
+
+    @property
+    def array(self) -> np.ndarray:
+        """The exemplars in the buffer (oldest first) as an (n, d) view"""
+
+        if self.__storage is None:
+            return np.zeros((0, 0))
+        start = (self.__head - self.__count) % self.maxlen
+        return self.__storage[start:start + self.__count]
+
+    def append(self, exemplar):
+
+        if self.__storage is None:
+            self.__allocate(len(exemplar))
+
+        self.__storage[self.__head] = exemplar
+        self.__storage[self.__head + self.maxlen] = exemplar
+        self.__head = (self.__head + 1) % self.maxlen
+        self.__count = min(self.__count + 1, self.maxlen)
+
+    def extend(self, exemplars):
+
+        exemplars = np.asarray(exemplars, dtype=float)
+        if len(exemplars) == 0:
+            return
+
+        if self.__storage is None:
+            self.__allocate(exemplars.shape[1])
+
+        # only the last maxlen exemplars would stay in the buffer anyway
+        exemplars = exemplars[-self.maxlen:]
+        num_new = len(exemplars)
+
+        # the first copies fit in [head, head + num_new) since head + num_new < 2*maxlen;
+        # the second copies of the ones that wrap around go to the start of the array
+        num_before_wrap = min(num_new, self.maxlen - self.__head)
+        self.__storage[self.__head:self.__head + num_new] = exemplars
+        self.__storage[self.__head + self.maxlen:self.__head + self.maxlen + num_before_wrap] = \
+            exemplars[:num_before_wrap]
+        self.__storage[:num_new - num_before_wrap] = exemplars[num_before_wrap:]
+
+        self.__head = (self.__head + num_new) % self.maxlen
+        self.__count = min(self.__count + num_new, self.maxlen)
+
+    def clear(self):
+        # the array is allocated again on the next append
+        self.__storage = None
+        self.__head = 0
+        self.__count = 0
+
+    def __getstate__(self):
+        # only save the exemplars, not the whole preallocated array
+        return {'maxlen': self.maxlen, 'exemplars': self.array.copy()}
+
+    def __setstate__(self, state):
+        self.__init__(state['maxlen'])
+        self.extend(state['exemplars'])
+
+    def __len__(self):
+        return self.__count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [tuple(exemplar) for exemplar in self.array[index]]
+        return tuple(self.array[index])
+
+    def __iter__(self):
+        return (tuple(exemplar) for exemplar in self.array)
+
+    def __repr__(self):
+        return repr(self.array)
@@ -6,11 +6,12 @@ from collections import defaultdict
 from collections import deque
 from time import perf_counter
 
-from sklearn import linear_model
 import numpy as np
 # import warnings
 # warnings.simplefilter("always")
 from .cbla_region_splitter import RegionSplitter as RegionSplitter
+from .cbla_linear_model import IncrementalLinearRegression
+from .cbla_exemplar_buffer import ExemplarBuffer
 
 
 class Expert():
@@ -33,7 +34,7 @@ class Expert():
         self.config['kga_delta'] = 10
         self.config['kga_tau'] = 30
         self.config['max_training_data_num'] = 500
-        self.config['prediction_model'] = linear_model.LinearRegression()
+        self.config['prediction_model'] = IncrementalLinearRegression()
 
         # custom configurations
         for param, value in config_kwargs.items():
@@ -51,11 +52,11 @@ class Expert():
         self.region_splitter = None
 
         # memory
-        self.training_data = deque(maxlen=int(max(self.config['split_thres'], self.config['max_training_data_num'])))
-        self.training_label = deque(maxlen=int(max(self.config['split_thres'], self.config['max_training_data_num'])))
+        self.training_data = ExemplarBuffer(maxlen=int(max(self.config['split_thres'], self.config['max_training_data_num'])))
+        self.training_label = ExemplarBuffer(maxlen=int(max(self.config['split_thres'], self.config['max_training_data_num'])))
 
-        # prediction model
-        self.predict_model = self.config['prediction_model']
+        # prediction model (each expert has its own copy of the configured model)
+        self.predict_model = deepcopy(self.config['prediction_model'])
 
         # error is max at first
         self.mean_error = self.config['mean_err_0']
@@ -86,6 +87,17 @@ class Expert():
         self.split_lock_count = 0
         self.split_lock_count_thres = self.config['split_lock_count_thres']
 
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+
+        # experts saved when the exemplars were kept in deques
+        for name in ('training_data', 'training_label'):
+            exemplars = state.get(name)
+            if isinstance(exemplars, deque):
+                buffer = ExemplarBuffer(maxlen=exemplars.maxlen)
+                buffer.extend(list(exemplars))
+                setattr(self, name, buffer)
 
     def append(self, SM, S1, S1_predicted=None):
 
@@ -99,11 +111,18 @@ class Expert():
         self.training_count += 1
         self.action_count += 1
         if self.left is None and self.right is None:
+
+            # exemplar that will be pushed out of the memory
+            if len(self.training_data) == self.training_data.maxlen:
+                SM_old, S1_old = self.training_data[0], self.training_label[0]
+            else:
+                SM_old, S1_old = None, None
+
             self.training_data.append(SM)
             self.training_label.append(S1)
 
             # update prediction model
-            self.train()
+            self.update_model(SM, S1, SM_old, S1_old)
 
             # update the KGA
             if S1_predicted is not None:
@@ -136,17 +155,30 @@ class Expert():
         if num_sample < 1:
             return
 
-        # not enough features
+        # not enough features (the incremental model finds the minimum-norm solution instead)
         num_fea = len(self.training_data[0])
-        if num_sample < num_fea:
+        if num_sample < num_fea and not isinstance(self.predict_model, IncrementalLinearRegression):
             return
 
         try:
-            self.predict_model.fit(self.training_data, self.training_label)
+            self.predict_model.fit(self.training_data.array, self.training_label.array)
             # print(self.predict_model.coef_)
         except ValueError:
             pass
 
+    def update_model(self, SM, S1, SM_old=None, S1_old=None):
+
+        # models that can't be updated incrementally are refitted on all the training data
+        if not isinstance(self.predict_model, IncrementalLinearRegression):
+            self.train()
+            return
+
+        # refit once in a while so that rounding errors from the updates don't build up
+        if self.training_count % self.training_data.maxlen == 0:
+            self.train()
+        else:
+            self.predict_model.update(SM, S1, SM_old, S1_old)
+
     def predict(self, S, M):
 
         if not isinstance(S, tuple):
@@ -199,7 +231,7 @@ class Expert():
             if self.is_splitting():
                 # print("It's splitting")
                 # instantiate the splitter
-                self.region_splitter = RegionSplitter(self.training_data, self.training_label)
+                self.region_splitter = RegionSplitter(self.training_data.array, self.training_label.array)
 
                 # don't split if the split quality is low
                 if self.region_splitter.split_quality < self.split_quality_thres:
@@ -217,13 +249,13 @@ class Expert():
                                    **child_config)
 
                 # split the data to the correct region
-                for i in range(len(self.training_data)):
-                    if self.region_splitter.classify(self.training_data[i]):
-                        self.right.training_data.append(self.training_data[i])
-                        self.right.training_label.append(self.training_label[i])
-                    else:
-                        self.left.training_data.append(self.training_data[i])
-                        self.left.training_label.append(self.training_label[i])
+                training_data = self.training_data.array
+                training_label = self.training_label.array
+                is_right = self.region_splitter.classify_array(training_data)
+                self.right.training_data.extend(training_data[is_right])
+                self.right.training_label.extend(training_label[is_right])
+                self.left.training_data.extend(training_data[~is_right])
+                self.left.training_label.extend(training_label[~is_right])
 
                 # if either of them is empty (which shouldn't happen)
                 if len(self.left.training_data) <= 1 or len(self.right.training_data) <= 1:
@@ -318,6 +350,38 @@ class Expert():
             else:
                 return self.left.evaluate_action(S1, M1)
 
+    def evaluate_actions(self, S1, M1_array):
+        """Evaluates many actions at once; M1_array has one action per row. Returns an array of action values"""
+
+        if not isinstance(S1, tuple):
+            raise TypeError("S1 must be a tuple (current value = %s)" % str(S1))
+
+        M1_array = np.asarray(M1_array, dtype=float)
+        num_action = len(M1_array)
+
+        SM_array = np.hstack((np.tile(np.asarray(S1, dtype=float), (num_action, 1)), M1_array))
+        action_values = np.empty(num_action)
+
+        self._evaluate_actions(SM_array, np.arange(num_action), action_values)
+
+        return action_values
+
+    def _evaluate_actions(self, SM_array, idx, action_values):
+
+        # this is leaf node
+        if self.left is None and self.right is None:
+            action_values[idx] = self.action_value
+
+        # Cases when only one of the child is NONE
+        elif self.left is None or self.right is None:
+            raise(Exception, "Expert's Tree structure is corrupted! One child branch is missing")
+
+        elif len(idx) > 0:
+            # route each action to the correct child node
+            is_right = self.region_splitter.classify_array(SM_array)
+            self.right._evaluate_actions(SM_array[is_right], idx[is_right], action_values)
+            self.left._evaluate_actions(SM_array[~is_right], idx[~is_right], action_values)
+
     def print(self, level=0):
 
         # this is leaf node
@@ -332,41 +396,98 @@ class Expert():
             print((" ")*len(" L ** ")*level, "R ** ", end="")
             self.right.print(level+1)
 
+    def save_leaf_info(self, info, include_model=True):
+
+        try:
+            info['expert_ids'].append(self.expert_id)
+        except AttributeError:
+            info['expert_ids'] = [self.expert_id]
+
+        # plain floats pickle to a fraction of the size of numpy scalars
+        info['mean_errors'][self.expert_id] = float(self.mean_error)
+        info['action_values'][self.expert_id] = float(self.action_value)
+        info['action_counts'][self.expert_id] = int(self.action_count)
+        info['latest_rewards'][self.expert_id] = float(self.rewards_history[-1])
+
+        if include_model:
+            info['prediction_model'][self.expert_id] = self.predict_model
+
+    def get_model_coefs(self) -> tuple:
+        '''Returns the coefficients and the intercepts of the prediction model as float32 arrays (None if not fitted)'''
+
+        try:
+            coef = np.atleast_2d(self.predict_model.coef_).astype(np.float32)
+            intercept = np.atleast_1d(self.predict_model.intercept_).astype(np.float32)
+        except AttributeError:
+            return None, None
+
+        return coef, intercept
+
     def save_expert_info(self, info, include_exemplars=False):
 
         # this is leaf node
         if self.left is None and self.right is None:
 
-            try:
-                info['expert_ids'].append(self.expert_id)
-            except AttributeError:
-                info['expert_ids'] = [self.expert_id]
-
-            info['mean_errors'][self.expert_id] = self.mean_error
-            info['action_values'][self.expert_id] = self.action_value
-            info['action_counts'][self.expert_id] = self.action_count
-            info['latest_rewards'][self.expert_id] = self.rewards_history[-1]
+            self.save_leaf_info(info)
 
             if include_exemplars:
-                info['exemplars'][self.expert_id] = [copy(self.training_data), copy(self.training_label)]
+                info['exemplars'][self.expert_id] = [self.training_data.array.copy(), self.training_label.array.copy()]
 
-            info['prediction_model'][self.expert_id] = self.predict_model
         else:
             self.left.save_expert_info(info, include_exemplars=include_exemplars)
             self.right.save_expert_info(info, include_exemplars=include_exemplars)
 
 class KGA():
 
+    """
+    Knowledge gain assessor. The prediction errors are kept in a fixed-capacity ring buffer of the last delta + tau
+    errors, along with running sums of the windows used by calc_mean_error and metaM, so every step is O(1).
+    The running sums are recomputed from the buffer once per cycle through it so that rounding errors don't build up.
+    The buffer is a preallocated list; for these few errors, indexing a NumPy array costs more than it saves.
+    """
+
     def __init__(self, e0, delta=50, tau=10):
         if not isinstance(e0, float):
             raise(TypeError, "e0 must be a float")
-        self.errors = [e0]
 
         # smoothing parameter
-        self.delta = delta
+        self.delta = int(delta)
 
         # time window
-        self.tau = tau
+        self.tau = int(tau)
+
+        self.errors = [e0]
+
+    @property
+    def errors(self) -> list:
+        """The errors in the buffer, oldest first"""
+        start = self.__head - self.__count
+        return [self.__buffer[(start + i) % self.__capacity] for i in range(self.__count)]
+
+    @errors.setter
+    def errors(self, errors):
+
+        self.__capacity = self.delta + self.tau
+        self.__buffer = [0.0] * self.__capacity
+        self.__head = 0
+        self.__count = 0
+        self.__resync_countdown = self.__capacity
+
+        for error in list(errors)[-self.__capacity:]:
+            self.__buffer[self.__head] = float(error)
+            self.__head = (self.__head + 1) % self.__capacity
+            self.__count += 1
+        self.__resync_sums()
+
+    def __setstate__(self, state):
+
+        # KGA saved before the ring buffer kept its errors in a list
+        errors = state.pop('errors', None)
+        self.__dict__.update(state)
+        if errors is not None:
+            self.delta = int(self.delta)
+            self.tau = int(self.tau)
+            self.errors = errors
 
     def append_error(self, S_actual, S_predicted):
         if not isinstance(S_actual, tuple):
@@ -374,40 +495,65 @@ class KGA():
         if not isinstance(S_predicted, tuple):
             raise(TypeError, "S_predicted must be a tuple")
 
-        error = 0
-        for i in range(len(S_actual)):
-            error += (S_actual[i] - S_predicted[i])**2
-        error = math.sqrt(error/len(S_actual))
+        error = math.sqrt(math.fsum([(s_a - s_p)**2 for s_a, s_p in zip(S_actual, S_predicted)])/len(S_actual))
         #print("Prediction Error: ", error)
-        self.errors.append(error)
+
+        # errors leaving the windows of the last tau errors, the last delta errors and the buffer
+        self.__sum_tau -= self.__get_from_end(self.tau)
+        self.__sum_delta -= self.__get_from_end(self.delta)
+        self.__sum_all -= self.__get_from_end(self.__capacity)
+
+        self.__buffer[self.__head] = error
+        self.__head = (self.__head + 1) % self.__capacity
+        self.__count = min(self.__count + 1, self.__capacity)
+
+        self.__sum_tau += error
+        self.__sum_delta += error
+        self.__sum_all += error
+
+        self.__resync_countdown -= 1
+        if self.__resync_countdown <= 0:
+            self.__resync_sums()
+
         return error
 
     def calc_mean_error(self):
 
         # if there aren't enough error in the history yet
-        if len(self.errors) == 0:
+        if self.__count == 0:
             mean_error = float("inf")
         else:
-            errors = self.errors[-int(self.delta):]
-            mean_error = math.fsum(errors)/len(errors)
+            mean_error = self.__sum_delta/min(self.__count, self.delta)
         return mean_error
 
     def metaM(self):
 
         # if there aren't enough error in the history yet
-        if len(self.errors) == 0:
+        if self.__count == 0:
             mean_error_predicted = float("inf")
-        elif len(self.errors) <= self.tau:
-            mean_error_predicted = self.errors[0]
+        elif self.__count <= self.tau:
+            mean_error_predicted = self.__buffer[(self.__head - self.__count) % self.__capacity]
         else:
-            errors = self.errors[-int(self.delta+self.tau):-int(self.tau)]
-            mean_error_predicted = math.fsum(errors)/len(errors)
+            # the errors in the buffer except the last tau errors
+            mean_error_predicted = (self.__sum_all - self.__sum_tau)/(self.__count - self.tau)
         return mean_error_predicted
 
     def calc_reward(self):
-        #remove old histories that are not needed
-        self.errors = self.errors[-int(self.delta+self.tau):]
         reward = self.metaM() - self.calc_mean_error()
         if math.isnan(reward):  # happens when it's inf - inf
             reward = 0
         return reward
+
+    def __get_from_end(self, n):
+        """Returns the n-th latest error, or 0 if there are fewer than n errors in the buffer"""
+        if n <= 0 or n > self.__count:
+            return 0.0
+        return self.__buffer[(self.__head - n) % self.__capacity]
+
+    def __resync_sums(self):
+
+        errors = self.errors
+        self.__sum_all = math.fsum(errors)
+        self.__sum_delta = math.fsum(errors[-self.delta:]) if self.delta > 0 else 0.0
+        self.__sum_tau = math.fsum(errors[-self.tau:]) if self.tau > 0 else 0.0
+        self.__resync_countdown = self.__capacity
@@ -0,0 +1,325 @@
+__author__ = 'Matthew'
+
+import numpy as np
+
+from .cbla_expert import Expert
+
+
+class ExpertTree():
+
+    """
+    Flattened, array-backed index of an Expert tree.
+
+    - Every node of the tree is a row in the parallel arrays cut_dim, cut_val, left, right and leaf_slot.
+      leaf_slot is -1 for internal nodes.
+    - Every leaf has a slot in the per-leaf tables (leaf Expert, expert id, action value, mean error, action count).
+    - Finding the leaf of a sample is an iterative index walk instead of recursive calls,
+      and an array of samples is routed down the tree together, one level at a time.
+    - The leaf Experts still keep the exemplars, prediction models and KGAs.
+      The arrays are updated when a leaf is trained or split.
+    - The slots of the leaves that were updated are kept in dirty_slots until they are collected with pop_dirty_slots.
+    """
+
+    def __init__(self, root: Expert, init_capacity=64):
+
+        if not isinstance(root, Expert):
+            raise TypeError("root must be an Expert!")
+
+        self.root = root
+
+        # tree nodes
+        self.num_nodes = 0
+        self.cut_dim = np.zeros(init_capacity, dtype=int)
+        self.cut_val = np.zeros(init_capacity)
+        self.left = np.full(init_capacity, -1, dtype=int)
+        self.right = np.full(init_capacity, -1, dtype=int)
+        self.leaf_slot = np.full(init_capacity, -1, dtype=int)
+
+        # leaf tables
+        self.num_leaves = 0
+        self.leaf_experts = []
+        self.leaf_node = np.zeros(init_capacity, dtype=int)
+        self.expert_ids = np.zeros(init_capacity, dtype=int)
+        self.action_values = np.zeros(init_capacity)
+        self.mean_errors = np.zeros(init_capacity)
+        self.action_counts = np.zeros(init_capacity, dtype=int)
+
+        # leaf slots updated since the last pop_dirty_slots
+        self.dirty_slots = set()
+
+        # build the arrays from the existing tree
+        stack = [(root, self.__add_node())]
+        while stack:
+            expert, node = stack.pop()
+            if expert.left is None and expert.right is None:
+                self.__set_leaf(node, expert)
+            else:
+                self.__set_internal(node, expert)
+                stack.append((expert.left, self.left[node]))
+                stack.append((expert.right, self.right[node]))
+
+    def find_leaf(self, SM) -> int:
+        """Returns the leaf slot of the region that SM belongs to"""
+
+        node = 0
+        while self.leaf_slot[node] < 0:
+            if SM[self.cut_dim[node]] > self.cut_val[node]:
+                node = self.right[node]
+            else:
+                node = self.left[node]
+        return self.leaf_slot[node]
+
+    def find_leaves(self, SM_array) -> np.ndarray:
+        """Returns the leaf slots of the regions that each row of SM_array belongs to"""
+
+        SM_array = np.asarray(SM_array, dtype=float)
+        nodes = np.zeros(len(SM_array), dtype=int)
+
+        return route_to_leaves(SM_array, nodes, self.cut_dim, self.cut_val, self.left, self.right, self.leaf_slot)
+
+    def append(self, SM, S1, S1_predicted=None):
+
+        slot = self.find_leaf(SM)
+        expert = self.leaf_experts[slot]
+        expert_id = expert.append(SM, S1, S1_predicted)
+
+        if expert.left is None and expert.right is None:
+            self.__update_leaf(slot)
+        else:
+            self.__split_leaf(slot)
+
+        return expert_id
+
+    def predict(self, S, M):
+        return self.leaf_experts[self.find_leaf(S + M)].predict(S, M)
+
+    def evaluate_action(self, S1, M1):
+        return self.action_values[self.find_leaf(S1 + M1)]
+
+    def evaluate_actions(self, S1, M1_array) -> np.ndarray:
+
+        M1_array = np.asarray(M1_array, dtype=float)
+        SM_array = np.hstack((np.tile(np.asarray(S1, dtype=float), (len(M1_array), 1)), M1_array))
+
+        return self.action_values[self.find_leaves(SM_array)]
+
+    def get_largest_action_value(self):
+        return self.action_values[:self.num_leaves].max()
+
+    def pop_dirty_slots(self) -> list:
+        """Returns the slots of the leaves updated since the last call, in order"""
+
+        dirty_slots = sorted(self.dirty_slots)
+        self.dirty_slots.clear()
+        return dirty_slots
+
+    def to_arrays(self) -> dict:
+        """Returns the whole tree as a dictionary of arrays"""
+
+        arrays = dict()
+        arrays['cut_dim'] = self.cut_dim[:self.num_nodes].copy()
+        arrays['cut_val'] = self.cut_val[:self.num_nodes].copy()
+        arrays['left'] = self.left[:self.num_nodes].copy()
+        arrays['right'] = self.right[:self.num_nodes].copy()
+        arrays['leaf_slot'] = self.leaf_slot[:self.num_nodes].copy()
+        arrays['expert_ids'] = self.expert_ids[:self.num_leaves].copy()
+        arrays['action_values'] = self.action_values[:self.num_leaves].copy()
+        arrays['mean_errors'] = self.mean_errors[:self.num_leaves].copy()
+        arrays['action_counts'] = self.action_counts[:self.num_leaves].copy()
+
+        # linear prediction models of the leaves (NaN if a leaf has no fitted model yet)
+        coefs = []
+        intercepts = []
+        for expert in self.leaf_experts:
+            try:
+                coefs.append(np.atleast_2d(expert.predict_model.coef_))
+                intercepts.append(np.atleast_1d(expert.predict_model.intercept_))
+            except AttributeError:
+                coefs.append(None)
+                intercepts.append(None)
+        coef_shape = next((coef.shape for coef in coefs if coef is not None), (0, 0))
+        arrays['coef'] = np.full((self.num_leaves,) + coef_shape, np.nan)
+        arrays['intercept'] = np.full((self.num_leaves, coef_shape[0]), np.nan)
+        for slot, (coef, intercept) in enumerate(zip(coefs, intercepts)):
+            if coef is not None and coef.shape == coef_shape:
+                arrays['coef'][slot] = coef
+                arrays['intercept'][slot] = intercept
+
+        return arrays
+
+    def __add_node(self) -> int:
+
+        if self.num_nodes == len(self.cut_dim):
+            capacity = 2 * len(self.cut_dim)
+            self.cut_dim = self.__grow(self.cut_dim, capacity, 0)
+            self.cut_val = self.__grow(self.cut_val, capacity, 0)
+            self.left = self.__grow(self.left, capacity, -1)
+            self.right = self.__grow(self.right, capacity, -1)
+            self.leaf_slot = self.__grow(self.leaf_slot, capacity, -1)
+
+        self.num_nodes += 1
+        return self.num_nodes - 1
+
+    def __add_leaf(self, expert) -> int:
+
+        if self.num_leaves == len(self.expert_ids):
+            capacity = 2 * len(self.expert_ids)
+            self.leaf_node = self.__grow(self.leaf_node, capacity, 0)
+            self.expert_ids = self.__grow(self.expert_ids, capacity, 0)
+            self.action_values = self.__grow(self.action_values, capacity, 0)
+            self.mean_errors = self.__grow(self.mean_errors, capacity, 0)
+            self.action_counts = self.__grow(self.action_counts, capacity, 0)
+
+        self.leaf_experts.append(expert)
+        self.num_leaves += 1
+        return self.num_leaves - 1
+
+    def __set_leaf(self, node, expert, slot=None):
+
+        if slot is None:
+            slot = self.__add_leaf(expert)
+        else:
+            self.leaf_experts[slot] = expert
+
+        self.leaf_slot[node] = slot
+        self.leaf_node[slot] = node
+        self.__update_leaf(slot)
+
+    def __set_internal(self, node, expert):
+
+        self.cut_dim[node] = expert.region_splitter.cut_dim
+        self.cut_val[node] = expert.region_splitter.cut_val
+        self.leaf_slot[node] = -1
+        self.left[node] = self.__add_node()
+        self.right[node] = self.__add_node()
+
+    def __update_leaf(self, slot):
+
+        expert = self.leaf_experts[slot]
+        self.expert_ids[slot] = expert.expert_id
+        self.action_values[slot] = expert.action_value
+        self.action_counts[slot] = expert.action_count
+        if expert.mean_error is not None:
+            self.mean_errors[slot] = expert.mean_error
+        self.dirty_slots.add(slot)
+
+    def __split_leaf(self, slot):
+
+        # the left child takes over the slot of the old leaf
+        expert = self.leaf_experts[slot]
+        node = self.leaf_node[slot]
+        self.__set_internal(node, expert)
+        self.__set_leaf(self.left[node], expert.left, slot=slot)
+        self.__set_leaf(self.right[node], expert.right)
+
+    @staticmethod
+    def __grow(array, capacity, fill_val):
+        new_array = np.full(capacity, fill_val, dtype=array.dtype)
+        new_array[:len(array)] = array
+        return new_array
+
+
+class ExpertForest():
+
+    """
+    Routes the action candidates of many ExpertTrees in one vectorized pass.
+
+    - The node arrays of all the trees are concatenated, with the child and leaf indices of each tree
+      shifted by its offsets, so that the trees form one forest in one set of arrays.
+    - Every sample starts the walk at the root of its own tree.
+    - The concatenated arrays are rebuilt only when one of the trees has split since the last pass.
+      The action values are gathered again every pass since they change whenever a leaf is trained.
+    - All the trees must be of experts with the same S and M dimensions.
+    """
+
+    def __init__(self, trees: list):
+
+        self.trees = list(trees)
+        for tree in self.trees:
+            if not isinstance(tree, ExpertTree):
+                raise TypeError("trees must be a list of ExpertTree!")
+
+        # number of nodes of each tree when the concatenated arrays were built
+        self.__built_sizes = None
+
+        self.node_offsets = None
+        self.leaf_offsets = None
+        self.cut_dim = None
+        self.cut_val = None
+        self.left = None
+        self.right = None
+        self.leaf_slot = None
+
+    def evaluate_actions(self, S1_list, M1_arrays) -> list:
+        """Returns the action values of the candidates M1_arrays[i] in state S1_list[i] of trees[i]"""
+
+        if len(S1_list) != len(self.trees) or len(M1_arrays) != len(self.trees):
+            raise ValueError("There must be one state and one array of action candidates per tree.")
+
+        self.__build()
+
+        # stack the samples of all the trees
+        SM_arrays = []
+        for S1, M1_array in zip(S1_list, M1_arrays):
+            M1_array = np.asarray(M1_array, dtype=float)
+            SM_arrays.append(np.hstack((np.tile(np.asarray(S1, dtype=float), (len(M1_array), 1)), M1_array)))
+        num_samples = [len(SM_array) for SM_array in SM_arrays]
+        SM_all = np.vstack(SM_arrays)
+
+        # every sample starts at the root of its tree
+        nodes = np.repeat(self.node_offsets, num_samples)
+        leaves = route_to_leaves(SM_all, nodes, self.cut_dim, self.cut_val, self.left, self.right, self.leaf_slot)
+
+        action_values = np.concatenate([tree.action_values[:tree.num_leaves] for tree in self.trees])
+        vals = action_values[leaves]
+
+        return np.split(vals, np.cumsum(num_samples)[:-1])
+
+    def __build(self):
+
+        sizes = tuple(tree.num_nodes for tree in self.trees)
+        if sizes == self.__built_sizes:
+            return
+
+        self.node_offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(int)
+        leaf_sizes = [tree.num_leaves for tree in self.trees]
+        self.leaf_offsets = np.concatenate(([0], np.cumsum(leaf_sizes)[:-1])).astype(int)
+
+        cut_dim = []
+        cut_val = []
+        left = []
+        right = []
+        leaf_slot = []
+        for tree, node_offset, leaf_offset in zip(self.trees, self.node_offsets, self.leaf_offsets):
+            n = tree.num_nodes
+            is_leaf = tree.leaf_slot[:n] >= 0
+            cut_dim.append(tree.cut_dim[:n])
+            cut_val.append(tree.cut_val[:n])
+            left.append(np.where(is_leaf, -1, tree.left[:n] + node_offset))
+            right.append(np.where(is_leaf, -1, tree.right[:n] + node_offset))
+            leaf_slot.append(np.where(is_leaf, tree.leaf_slot[:n] + leaf_offset, -1))
+
+        self.cut_dim = np.concatenate(cut_dim)
+        self.cut_val = np.concatenate(cut_val)
+        self.left = np.concatenate(left)
+        self.right = np.concatenate(right)
+        self.leaf_slot = np.concatenate(leaf_slot)
+
+        self.__built_sizes = sizes
+
+
+def route_to_leaves(SM_array, nodes, cut_dim, cut_val, left, right, leaf_slot) -> np.ndarray:
+    """Walks each row of SM_array down from its start node and returns the leaf slots that they end up in"""
+
+    rows = np.arange(len(SM_array))
+    nodes = nodes.copy()
+
+    # move every sample that is still at an internal node one level down
+    active = leaf_slot[nodes] < 0
+    while active.any():
+        active_nodes = nodes[active]
+        is_right = SM_array[rows[active], cut_dim[active_nodes]] > cut_val[active_nodes]
+        nodes[active] = np.where(is_right, right[active_nodes], left[active_nodes])
+        active = leaf_slot[nodes] < 0
+
+    return leaf_slot[nodes]
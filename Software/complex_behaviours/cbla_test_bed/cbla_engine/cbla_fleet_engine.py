@@ -0,0 +1,104 @@
+from time import sleep
+
+from .cbla_engine import *
+from .cbla_expert_tree import ExpertForest
+
+
+class CBLA_Fleet_Engine(object):
+
+    """
+    Steps the CBLA_Engines of many nodes of the same robot class together, in one synchronized tick.
+
+    - All the robots act, then there is one wait for the whole fleet (the longest wait of its robots),
+      then all the robots read.
+    - Each learner learns its own exemplar.
+    - The action candidates of all the learners are evaluated in one vectorized pass through an ExpertForest
+      of all their expert trees, instead of one pass per learner.
+    - update returns one data packet per engine, the same as CBLA_Engine.update.
+
+    The engines keep their own robot, learner, M and update count, so a node can leave the fleet
+    and go back to running its own CBLA_Engine at any time.
+    """
+
+    def __init__(self, engines: list, **config_kwargs):
+
+        # instantiate the configuration parameters
+        self.config = dict()
+        # custom configurations
+        for param, value in config_kwargs.items():
+            self.config[param] = value
+
+        self.engines = list(engines)
+        if len(self.engines) == 0:
+            raise ValueError("CBLA_Fleet_Engine must have at least one engine.")
+
+        for engine in self.engines:
+            if not isinstance(engine, CBLA_Engine):
+                raise TypeError("engines must be a list of CBLA_Engine!")
+            if not isinstance(engine.learner, Learner):
+                raise TypeError("The learners of a fleet must be run in this process!")
+
+        # the trees must be stacked into one forest
+        dims = set((len(engine.learner.S), len(engine.learner.M)) for engine in self.engines)
+        if len(dims) > 1:
+            raise ValueError("All the engines in a fleet must have the same S and M dimensions.")
+
+        self.forest = ExpertForest([engine.learner.expert_tree for engine in self.engines])
+
+    def update(self) -> list:
+
+        t0 = clock()
+
+        snapshots = []
+        for engine in self.engines:
+            engine.update_count += 1
+            snapshots.append(engine.check_snapshot(t0))
+
+        # act
+        for engine in self.engines:
+            with engine.robot_lock:
+                engine.robot.act(engine.M)
+
+        # wait
+        wait_time = 0
+        for engine in self.engines:
+            with engine.robot_lock:
+                wait_time = max(wait_time, engine.robot.get_wait_time())
+        sleep(wait_time)
+
+        # read
+        S2_list = []
+        for engine in self.engines:
+            with engine.robot_lock:
+                S2_list.append(engine.robot.read())
+
+        # learn
+        for engine, S2 in zip(self.engines, S2_list):
+            with engine.learner_lock:
+                engine.learner.learn(S2, engine.M)
+
+        # evaluate the action candidates of all the learners together
+        M_candidates_list = []
+        for engine in self.engines:
+            with engine.robot_lock:
+                num_sample = engine.learner.config['action_sample_num']
+                M_candidates_list.append(engine.robot.get_possible_action_array(num_sample=num_sample))
+        action_values_list = self.forest.evaluate_actions([engine.learner.S for engine in self.engines],
+                                                          M_candidates_list)
+
+        data_packets = []
+        for engine, S2, M_candidates, action_values, snapshot in \
+                zip(self.engines, S2_list, M_candidates_list, action_values_list, snapshots):
+
+            with engine.learner_lock:
+                # select action
+                with engine.robot_lock:
+                    engine.M = engine.learner.select_action(engine.robot, M_candidates=M_candidates,
+                                                            action_values=action_values)
+
+                # predict
+                S_predicted = engine.learner.predict()
+
+            data_packets.append(engine.make_data_packet(S2, S_predicted, t0, snapshot))
+
+        return data_packets
@@ -4,7 +4,10 @@ import random
 import warnings
 from collections import defaultdict
 
+import numpy as np
+
 from .cbla_expert import Expert
+from .cbla_expert_tree import ExpertTree
 from .cbla_robot import Robot
 
 
@@ -31,9 +34,20 @@ class Learner(object):
         else:
             self.expert = Expert(**self.config)
 
+        # flattened index of the expert tree used for the per-step look-ups
+        self.expert_tree = ExpertTree(self.expert)
+
         # learner information
         self.info = dict()
 
+        # copies of the exemplars of the leaves at the last snapshot (expert id --> [data, label]),
+        # and the ids of the leaves updated since then
+        self.exemplars_snapshot = dict()
+        self.stale_exemplar_ids = set()
+
+        # prediction model coefficients last put in the expert info (expert id --> (coef, intercept))
+        self.logged_model_coefs = dict()
+
         # misc. variables
         self.exploring_rate = self.config['exploring_rate']
 
@@ -42,6 +56,7 @@ class Learner(object):
         self.config['exploring_rate_range'] = (0.4, 0.01)
         self.config['exploring_reward_range'] = (-0.03, 0.004)
         self.config['adapt_exploring_rate'] = False
+        self.config['action_sample_num'] = 100
 
     def learn(self, S1, M):
 
@@ -49,18 +64,28 @@ class Learner(object):
             warnings.warn("Robot did not do that action Learner selected.", RuntimeWarning)
 
         # add exemplar to expert
-        selected_expert = self.expert.append(self.S + self.M, S1, self.S_predicted)
+        selected_expert = self.expert_tree.append(self.S + self.M, S1, self.S_predicted)
 
         # set current state to S1
         self.S = S1
 
         return selected_expert
 
-    def select_action(self, robot: Robot):
+    def select_action(self, robot: Robot, M_candidates=None, action_values=None):
 
         # from a set of possible action, select one
-        M_candidates = robot.get_possible_action(num_sample=100)
-        M1, M_best, val_best, is_exploring = self.action_selection(self.S, M_candidates)
+        if M_candidates is None:
+            M_candidates = robot.get_possible_action_array(num_sample=self.config['action_sample_num'])
+        self.choose_action(M_candidates, action_values=action_values)
+
+        robot.adapt_m_max_val_windowing(action_val=self.info['best_action_value'])
+
+        return self.M
+
+    def choose_action(self, M_candidates, action_values=None):
+
+        # the part of select_action that does not need the robot
+        M1, M_best, val_best, is_exploring = self.action_selection(self.S, M_candidates, action_values=action_values)
 
         self.M = M1
 
@@ -70,36 +95,36 @@ class Learner(object):
         self.info['is_exploring'] = is_exploring
 
         self.adapt_exploring_rate(action_value=val_best)
-        robot.adapt_m_max_val_windowing(action_val=val_best)
 
         return self.M
 
     def predict(self):
 
-        self.S_predicted = self.expert.predict(self.S, self.M)
+        self.S_predicted = self.expert_tree.predict(self.S, self.M)
 
         return self.S_predicted
 
-    def action_selection(self, S1, M_candidates, method='oudeyer'):
+    def action_selection(self, S1, M_candidates, method='oudeyer', action_values=None):
+
+        # evaluate all the candidates in one pass through the expert tree
+        # (unless they were already evaluated, e.g. together with the candidates of other learners)
+        M_candidates = np.asarray(M_candidates, dtype=float)
+        if action_values is None:
+            vals = self.expert_tree.evaluate_actions(S1, M_candidates)
+        else:
+            vals = np.asarray(action_values, dtype=float)
 
         # compute the M with the highest learning rate
-        M_best = []
-        val_best = -float("inf")
-        for M_candidate in M_candidates:
-            val = self.expert.evaluate_action(S1, M_candidate)
-            if val > val_best:
-                M_best = [M_candidate]
-                val_best = val
-            elif val == val_best:
-                M_best.append(M_candidate)
+        val_best = float(vals.max())
+        best_idx = np.flatnonzero(vals == val_best)
 
         # select the M1 randomly from the list of best
-        M_best = random.choice(M_best)
+        M_best = tuple(M_candidates[random.choice(best_idx)])
 
         is_exploring = (random.random() < self.exploring_rate)
         # select one randomly if it's exploring
         if is_exploring:
-            M1 = random.choice(M_candidates)
+            M1 = tuple(M_candidates[random.randrange(len(M_candidates))])
         else:
             M1 = M_best
 
@@ -123,13 +148,56 @@ class Learner(object):
         return self.exploring_rate
 
     def get_expert_info(self, snap_shot=False) -> defaultdict:
+        '''
+        Returns the info of the leaves updated since the last call, so its size does not grow with the tree.
+        Snapshots have the info and the exemplars of every leaf; only the exemplars of the leaves updated
+        since the last snapshot are copied again.
+
+        Instead of the prediction models, it has their coefficients and intercepts rounded to float32
+        (prediction_coefs and prediction_intercepts), and only when they changed or in snapshots.
+        '''
 
         info = defaultdict(dict)
 
-        self.expert.save_expert_info(info, include_exemplars=snap_shot)
+        dirty_slots = self.expert_tree.pop_dirty_slots()
+        leaf_experts = self.expert_tree.leaf_experts
+        for slot in dirty_slots:
+            self.stale_exemplar_ids.add(leaf_experts[slot].expert_id)
+
+        if not snap_shot:
+            for slot in dirty_slots:
+                leaf_experts[slot].save_leaf_info(info, include_model=False)
+                self.save_model_coefs(info, leaf_experts[slot])
+            return info
+
+        for expert in leaf_experts:
+            expert.save_leaf_info(info, include_model=False)
+            self.save_model_coefs(info, expert, changed_only=False)
+            if expert.expert_id in self.stale_exemplar_ids or expert.expert_id not in self.exemplars_snapshot:
+                self.exemplars_snapshot[expert.expert_id] = [expert.training_data.array.copy(),
+                                                             expert.training_label.array.copy()]
+        self.stale_exemplar_ids.clear()
+        info['exemplars'] = dict(self.exemplars_snapshot)
 
         return info
 
+    def save_model_coefs(self, info, expert: Expert, changed_only=True):
+
+        coef, intercept = expert.get_model_coefs()
+        if coef is None:
+            return
+
+        if changed_only and expert.expert_id in self.logged_model_coefs:
+            logged_coef, logged_intercept = self.logged_model_coefs[expert.expert_id]
+            if np.array_equal(coef, logged_coef) and np.array_equal(intercept, logged_intercept):
+                return
+
+        self.logged_model_coefs[expert.expert_id] = (coef, intercept)
+
+        # small tuples of floats pickle to a fraction of the size of numpy arrays
+        info['prediction_coefs'][expert.expert_id] = tuple(tuple(row) for row in coef.tolist())
+        info['prediction_intercepts'][expert.expert_id] = tuple(intercept.tolist())
+
 
 def weighted_choice_sub(weights, min_percent=0.05):
     min_weight = min(weights)
@@ -0,0 +1,231 @@
+__author__ = 'Matthew'
+
+import threading
+import multiprocessing
+from itertools import count
+from collections import defaultdict
+
+from .cbla_engine import *
+
+
+class LearnerPool(object):
+
+    """
+    LearnerPool runs the Learners of the CBLA nodes in a fixed number of worker processes.
+
+    - Each worker process (LearnerShard) holds a shard of the Learners; they are assigned round-robin.
+    - The node thread holds a RemoteLearner for its Learner. It keeps the robot, and for each step it only sends
+      S2, M and the action candidates, and gets back the next M, the prediction and the learner's info.
+    - Learning, action selection and prediction then run outside of the GIL of the main process,
+      so they do not hold up the node threads and the USB I/O threads.
+    """
+
+    def __init__(self, num_workers=None):
+
+        if num_workers is None:
+            num_workers = max(1, multiprocessing.cpu_count() - 1)
+
+        self.shards = []
+        for i in range(num_workers):
+            self.shards.append(LearnerShard(name='Learner_Shard_%d' % i))
+
+        self.__learner_ids = count()
+
+    def add_learner(self, learner: Learner):
+
+        if not isinstance(learner, Learner):
+            raise TypeError("learner must be of type Learner!")
+
+        learner_id = next(self.__learner_ids)
+        shard = self.shards[learner_id % len(self.shards)]
+        shard.request(learner_id, 'add', learner)
+
+        return RemoteLearner(shard, learner_id, learner)
+
+    def stop(self, timeout=None):
+        '''Stops the worker processes; the nodes must have saved their states first'''
+
+        for shard in self.shards:
+            shard.stop(timeout)
+
+
+class LearnerShard(object):
+
+    """
+    LearnerShard is a worker process running a shard of the Learners.
+
+    A request and its reply are sent over the same pipe, so only one node thread at a time can use the shard.
+    This costs nothing, since the worker process handles one request at a time anyway.
+    """
+
+    def __init__(self, name='Learner_Shard'):
+
+        self.lock = threading.Lock()
+
+        self.conn, worker_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_run_learner_shard, args=(worker_conn,),
+                                               name=name, daemon=True)
+        self.process.start()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def request(self, learner_id, command, *args):
+
+        with self.lock:
+            self.conn.send((learner_id, command, args))
+            status, result = self.conn.recv()
+
+        if status == 'error':
+            raise RuntimeError("Learner %s: %s" % (str(learner_id), result))
+        return result
+
+    def stop(self, timeout=None):
+
+        if self.process.is_alive():
+            try:
+                self.request(None, 'stop')
+            except (EOFError, OSError):
+                pass
+        self.process.join(timeout)
+
+
+class RemoteLearner(object):
+
+    """
+    RemoteLearner stands in for a Learner that is run by a LearnerShard.
+
+    It has the part of the interface of Learner that is used by CBLA_Pooled_Engine and the CBLA nodes.
+    get_expert_info returns the expert info computed in the last update, so that it does not take another request.
+    """
+
+    def __init__(self, shard: LearnerShard, learner_id: int, learner: Learner):
+
+        self.shard = shard
+        self.learner_id = learner_id
+
+        # local copies of the state of the Learner, updated with each reply
+        self.config = dict(learner.config)
+        self.S = learner.S
+        self.M = learner.M
+        self.S_predicted = learner.S_predicted
+        self.info = dict(learner.info)
+        self.expert_info = defaultdict(dict)
+
+    @property
+    def expert(self) -> Expert:
+        return self.shard.request(self.learner_id, 'get_expert')
+
+    def select_action(self, robot: Robot, M_candidates=None):
+
+        if M_candidates is None:
+            M_candidates = robot.get_possible_action_array(num_sample=self.config['action_sample_num'])
+
+        self.M, self.info = self.shard.request(self.learner_id, 'choose_action', M_candidates)
+
+        robot.adapt_m_max_val_windowing(action_val=self.info['best_action_value'])
+
+        return self.M
+
+    def update(self, S2, M, M_candidates, snap_shot=False):
+        '''learn, choose_action and predict in one request; returns the next M and the predicted S'''
+
+        self.M, self.S_predicted, self.info, self.expert_info = \
+            self.shard.request(self.learner_id, 'update', S2, M, M_candidates, snap_shot)
+        self.S = S2
+
+        return self.M, self.S_predicted
+
+    def get_expert_info(self, snap_shot=False) -> defaultdict:
+        return self.expert_info
+
+
+class CBLA_Pooled_Engine(CBLA_Engine):
+
+    """
+    CBLA_Engine whose Learner is run by a LearnerPool.
+
+    The node thread acts, waits, reads and draws the action candidates from the robot,
+    then hands S2 and M over to the worker process and waits for the next M.
+    """
+
+    def __init__(self, robot: Robot, learner: RemoteLearner, **config_kwargs):
+
+        if not isinstance(learner, RemoteLearner):
+            raise TypeError("learner must be a RemoteLearner!")
+
+        super(CBLA_Pooled_Engine, self).__init__(robot, learner, **config_kwargs)
+
+    def update(self):
+
+        t0 = clock()
+        self.update_count += 1
+
+        # save snapshot or not
+        snapshot = self.check_snapshot(t0)
+
+        with self.robot_lock:
+            # act
+            self.robot.act(self.M)
+
+            # wait
+            self.robot.wait()
+
+            # read
+            S2 = self.robot.read()
+
+            # the action candidates depend on the state of the robot
+            M_candidates = self.robot.get_possible_action_array(num_sample=self.learner.config['action_sample_num'])
+
+        # learn, select action and predict in the worker process
+        with self.learner_lock:
+            self.M, S_predicted = self.learner.update(S2, self.M, M_candidates, snap_shot=snapshot)
+
+        with self.robot_lock:
+            self.robot.adapt_m_max_val_windowing(action_val=self.learner.info['best_action_value'])
+
+        # save to data packet
+        return self.make_data_packet(S2, S_predicted, t0, snapshot)
+
+
+def _run_learner_shard(conn):
+
+    # learner_id --> Learner
+    learners = dict()
+
+    while True:
+        try:
+            learner_id, command, args = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if command == 'stop':
+            conn.send(('ok', None))
+            break
+
+        try:
+            if command == 'add':
+                learners[learner_id] = args[0]
+                result = None
+            elif command == 'update':
+                result = _update_learner(learners[learner_id], *args)
+            elif command == 'choose_action':
+                learner = learners[learner_id]
+                result = (learner.choose_action(args[0]), dict(learner.info))
+            elif command == 'get_expert':
+                result = learners[learner_id].expert
+            else:
+                raise ValueError("Unknown command %s." % command)
+        except Exception as e:
+            conn.send(('error', '%s: %s' % (e.__class__.__name__, e)))
+        else:
+            conn.send(('ok', result))
+
+
+def _update_learner(learner: Learner, S2, M, M_candidates, snap_shot):
+
+    learner.learn(S2, M)
+    M1 = learner.choose_action(M_candidates)
+    S_predicted = learner.predict()
+
+    return M1, S_predicted, dict(learner.info), learner.get_expert_info(snap_shot=snap_shot)
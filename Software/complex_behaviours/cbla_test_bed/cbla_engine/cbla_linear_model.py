@@ -0,0 +1,114 @@
+__author__ = 'Matthew'
+
+import numpy as np
+
+
+class IncrementalLinearRegression():
+
+    """
+    Least-squares linear model over a sliding window of exemplars that is updated one exemplar at a time.
+
+    It keeps the normal equations (X'X and X'Y, with a column of ones for the intercept) of the exemplars in the window.
+    Adding an exemplar is a rank-1 update, and removing the oldest one when the window is full is a rank-1 downdate,
+    so adding an exemplar costs O(d^2) instead of refitting on the whole window.
+    The coefficients are solved from the (d+1)x(d+1) normal equations on the first predict after an update,
+    which costs O(d^3) but does not depend on the number of exemplars in the window.
+    It has the same fit and predict interface as the models in sklearn.linear_model.
+
+    Unlike LinearRegression in an Expert, it is used even when there are fewer exemplars than features;
+    it then predicts with the minimum-norm least-squares fit, where the Expert used to predict S unchanged.
+
+    alpha is the L2 regularization (ridge) on the coefficients; the intercept is not regularized.
+    """
+
+    def __init__(self, alpha=0.0):
+
+        self.alpha = alpha
+
+        # normal equations
+        self.xtx = None
+        self.xty = None
+        self.num_sample = 0
+
+        # solved lazily when the model is used
+        self.__coef = None
+        self.__intercept = None
+        self.__is_solved = False
+
+    @property
+    def coef_(self):
+        if not self.__is_solved:
+            self.__solve()
+        return self.__coef
+
+    @property
+    def intercept_(self):
+        if not self.__is_solved:
+            self.__solve()
+        return self.__intercept
+
+    def fit(self, X, y):
+
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if X.ndim != 2 or y.ndim != 2 or len(X) != len(y):
+            raise ValueError("X and y must be 2D arrays with the same number of samples.")
+
+        X_aug = self.__augment(X)
+        self.xtx = X_aug.T.dot(X_aug)
+        self.xty = X_aug.T.dot(y)
+        self.num_sample = len(X)
+        self.__is_solved = False
+        return self
+
+    def update(self, x_new, y_new, x_old=None, y_old=None):
+        """Add the exemplar (x_new, y_new) and remove the exemplar (x_old, y_old) that left the window"""
+
+        x_new = self.__augment(np.asarray(x_new, dtype=float))
+        y_new = np.asarray(y_new, dtype=float)
+
+        if self.xtx is None:
+            self.xtx = np.zeros((len(x_new), len(x_new)))
+            self.xty = np.zeros((len(x_new), len(y_new)))
+
+        self.xtx += np.outer(x_new, x_new)
+        self.xty += np.outer(x_new, y_new)
+        self.num_sample += 1
+
+        if x_old is not None:
+            x_old = self.__augment(np.asarray(x_old, dtype=float))
+            self.xtx -= np.outer(x_old, x_old)
+            self.xty -= np.outer(x_old, np.asarray(y_old, dtype=float))
+            self.num_sample -= 1
+
+        self.__is_solved = False
+
+    def predict(self, X):
+
+        if not self.__is_solved:
+            self.__solve()
+
+        return np.asarray(X, dtype=float).dot(self.__coef.T) + self.__intercept
+
+    def __solve(self):
+
+        # same as an unfitted sklearn model
+        if self.xtx is None or self.num_sample < 1:
+            raise AttributeError("Model has not been fitted.")
+
+        A = self.xtx.copy()
+        if self.alpha > 0:
+            A[1:, 1:] += self.alpha * np.eye(len(A) - 1)
+
+        # minimum-norm solution when there are too few exemplars to determine all the coefficients
+        beta = np.linalg.lstsq(A, self.xty, rcond=-1)[0]
+
+        self.__intercept = beta[0]
+        self.__coef = beta[1:].T
+        self.__is_solved = True
+
+    @staticmethod
+    def __augment(X):
+        if X.ndim == 1:
+            return np.concatenate(([1.0], X))
+        return np.hstack((np.ones((len(X), 1)), X))
@@ -9,16 +9,13 @@ class RegionSplitter():
     def __init__(self, data, label):
 
         t0 = perf_counter()
-        comp_count = 0
         self.cut_dim = 0
         self.cut_val = 0
 
-        data_dim_num = len(data[0])
-        label_dim_num = len(label[0])
+        data = np.asarray(data, dtype=float)
+        label = np.asarray(label, dtype=float)
 
-        num_candidates = 5
-        zoom_range = 1
-        max_zoom_num = 4
+        data_dim_num = data.shape[1]
 
         data_num = len(data)
         # if too few data (need enough so that the subgroups can still not be under-fit)
@@ -26,23 +23,8 @@ class RegionSplitter():
             self.__split_quality = -float('inf')
             return
 
-        # if just enough data, it can only cut in the middle
-        elif data_num == data_dim_num*2:
-            cut_idx_arr_0 = (data_dim_num,)
-        elif data_num < num_candidates:
-            cut_idx_arr_0 = tuple(range(data_dim_num, data_num-data_dim_num))
-        else:
-            cut_idx_arr_0 = sorted(tuple(set(np.linspace(data_dim_num, data_num-data_dim_num-1, num_candidates).astype(int))))
-
         # transform the label using PCA
-        label_tf = PCA().fit_transform(np.array(label))
-
-        sample = list(zip(data, label_tf))
-
-        # storage while calculating the best
-        best_score = -float("inf")
-        # [group_size_diff, var_reduction, cut_dim, cut_val]
-        best_cut_arr = [(-float("inf"), self.cut_dim, self.cut_val, 0)]
+        label_tf = PCA().fit_transform(label)
 
         # calculate the norm of the overall variance
         overall_var = np.linalg.norm(np.var(label_tf, axis=0, ddof=1))
@@ -53,92 +35,38 @@ class RegionSplitter():
 
         else:
 
-            # sort in each dimension
-            for i in range(data_dim_num):
-
-                # sort the data in dimension i
-                sorted_samples = sorted(sample, key=lambda x: x[0][i])
-                # separate the data back into data and label again
-                sorted_dim_data = [sample[0][i] for sample in sorted_samples]
-                sorted_label = [sample[1] for sample in sorted_samples]
-
-                # start with the evenly spaced cut_idx_arr
-                cut_idx_arr = cut_idx_arr_0
-                zoom_num = 0
-
-                while len(cut_idx_arr) >= 1 and zoom_num < max_zoom_num:
-
-                    # storage while calculating the best
-                    dim_best_score = -float("inf")
-                    # [group_size_diff, var_reduction, cut_dim, cut_val]
-                    dim_best_cut_arr = [(-float("inf"), i, self.cut_val, 0)]
-
-                    for k in range(len(cut_idx_arr)):
-                        cut_idx = cut_idx_arr[k]
-                        cut_val = sorted_dim_data[cut_idx]
-
-                        # split into groups
-                        groups = [sorted_label[:cut_idx], sorted_label[cut_idx:]]
-
-                        # check if any of the group is too small
-                        if len(groups[0]) < data_dim_num or len(groups[1]) < data_dim_num:
-                            continue
-
-                        score, quality = RegionSplitter.calc_split_score(groups, overall_var=overall_var)
-                        comp_count += 1
-
-                        if score > dim_best_score:
+            # every cut index that leaves at least data_dim_num samples (and 2 for the variance) in each group
+            min_group_size = max(data_dim_num, 2)
+            cut_idx_arr = np.arange(min_group_size, data_num - min_group_size + 1)
 
-                            dim_best_score = score
-                            dim_best_cut_arr = [(quality, i, cut_val, k),]
+            best_score = -float("inf")
+            best_quality = -float("inf")
 
-                        elif score == dim_best_score:
-                            dim_best_cut_arr.append((quality, i, cut_val, k))
-
-                        else:
-                            pass
-
-                    # sorting the best cut array with best quality at the front
-                    dim_best_cut_arr = sorted(dim_best_cut_arr, key=lambda x: x[0], reverse=True)
-                    dim_best_k = dim_best_cut_arr[0][3]
-
-                    # get out when there's only one to consider
-                    if len(cut_idx_arr) <= zoom_range*2 + 1:
-                        break
-                    else:
-                        # zoom in to the neighbouring area
-                        low_cut_idx = cut_idx_arr[max(0, dim_best_k - zoom_range)]
-                        high_cut_idx = cut_idx_arr[min(len(cut_idx_arr) - 1, dim_best_k + zoom_range)]
-
-                        cut_idx_arr = sorted(tuple(set(np.linspace(low_cut_idx, high_cut_idx, num_candidates).astype(int))))
-                        zoom_num += 1
-
-                # check how this dimension stacks up against others
-                if dim_best_score > best_score:
-                    best_score = dim_best_score
-                    best_cut_arr = dim_best_cut_arr
-
-                elif dim_best_score == best_score:
-                    dim_best_cut_arr.append(dim_best_cut_arr)
+            for i in range(data_dim_num):
 
-                else:
-                    pass
+                # sort the data in dimension i (stable, so that equal values keep their order)
+                order = np.argsort(data[:, i], kind='mergesort')
+                sorted_dim_data = data[order, i]
 
-            # sorting the best cut array with best quality at the front
-            best_cut_arr = sorted(best_cut_arr, key=lambda x: x[0], reverse=True)
+                # the score of every cut at once
+                scores, qualities = RegionSplitter.calc_split_scores(label_tf[order], cut_idx_arr,
+                                                                     overall_var=overall_var)
+                if len(scores) == 0:
+                    continue
 
-            # the best cut_dim is the one with the highest quality
-            self.cut_dim = best_cut_arr[0][1]
-            self.cut_val = best_cut_arr[0][2]
+                k = int(np.argmax(scores))
+                if scores[k] > best_score:
+                    best_score = scores[k]
+                    best_quality = qualities[k]
+                    self.cut_dim = i
+                    self.cut_val = sorted_dim_data[cut_idx_arr[k]]
 
             # the best split quality
-            self.__split_quality = best_cut_arr[0][0]
+            self.__split_quality = best_quality
         # print(self.__split_quality, ', ')
         split_clock = perf_counter() - t0
         #if split_clock > 1:
-        #print(split_clock, ', ', comp_count, ', ', self.cut_dim, ', ', self.cut_val)
-        # just cut in half
-        # self.cut_val = exemplars[int(sample_num/2)][0][self.cut_dim]
+        #print(split_clock, ', ', self.cut_dim, ', ', self.cut_val)
 
     @property
     def split_quality(self):
@@ -156,6 +84,14 @@ class RegionSplitter():
 
         return group == 0
 
+    def classify_array(self, data):
+        """Classifies each row of a 2D array at once; returns a boolean array"""
+
+        if self.split_quality == -float('inf'):
+            raise ValueError("Split Quality should not be -inf!")
+
+        return data[:, self.cut_dim] > self.cut_val
+
     @staticmethod
     def calc_split_score(groups, overall_var=None):
         if not len(groups) == 2:
@@ -182,3 +118,45 @@ class RegionSplitter():
         quality = 1 - avg_var/overall_var
 
         return score, quality
+
+    @staticmethod
+    def calc_split_scores(sorted_label, cut_idx_arr, overall_var=None):
+        """
+        Same as calc_split_score for every cut of the sorted labels into [:cut_idx] and [cut_idx:].
+        The group variances come from cumulative sums of the labels and of their squares, so all the cuts
+        are scored in O(n*d).
+        """
+
+        sorted_label = np.asarray(sorted_label, dtype=float)
+        cut_idx_arr = np.asarray(cut_idx_arr, dtype=int)
+        data_num = len(sorted_label)
+
+        # centre the labels to reduce the rounding errors of the sums
+        sorted_label = sorted_label - sorted_label.mean(axis=0)
+
+        if overall_var is None:
+            overall_var = np.linalg.norm(np.var(sorted_label, axis=0, ddof=1))
+
+        cum_sum = np.cumsum(sorted_label, axis=0)
+        cum_sq_sum = np.cumsum(sorted_label**2, axis=0)
+
+        # sums of each group
+        n_left = cut_idx_arr.astype(float)[:, np.newaxis]
+        n_right = data_num - n_left
+        sum_left = cum_sum[cut_idx_arr - 1]
+        sq_sum_left = cum_sq_sum[cut_idx_arr - 1]
+        sum_right = cum_sum[-1] - sum_left
+        sq_sum_right = cum_sq_sum[-1] - sq_sum_left
+
+        # in-group variances (ddof=1)
+        var_left = np.maximum(sq_sum_left - sum_left**2/n_left, 0)/(n_left - 1)
+        var_right = np.maximum(sq_sum_right - sum_right**2/n_right, 0)/(n_right - 1)
+
+        # mean of the norm of the variance weighted by group size
+        avg_var = (n_left[:, 0]*np.linalg.norm(var_left, axis=1) +
+                   n_right[:, 0]*np.linalg.norm(var_right, axis=1))/data_num
+
+        scores = -avg_var
+        qualities = 1 - avg_var/overall_var
+
+        return scores, qualities
@@ -1,6 +1,6 @@
 __author__ = 'Matthew'
 
-from abstract_node import Var, DataLogger
+from abstract_node import Var, DataLogger, get_var_window
 
 from time import sleep
 import numpy as np
@@ -34,6 +34,10 @@ class Robot(object):
                 raise TypeError('CBLA Engine only accepts Var type as motor variable')
             self.out_vars.append(var)
 
+        # time-windowed aggregates of the sensor variables and their period (created when first needed)
+        self.in_var_windows = None
+        self.in_var_window_period = None
+
         # the current wait_time
         self.sample_speed_limit = 0.0
         self.curr_wait_time = max(self.sample_speed_limit, self.config['wait_time'])
@@ -67,6 +71,11 @@ class Robot(object):
         self.config['sample_period'] = 5.0
         self.config['wait_time'] = 0.0  # 4.0
 
+        # aggregate the sensor variables over the wait between act and read from their VarWindows,
+        # instead of polling them sample_number times over sample_period after the wait;
+        # wait_time is then how long the robot is left to settle after it acts (0 reads the latest values)
+        self.config['windowed_sampling'] = True
+
         # adaptive activity level related constants
         self.config['prev_values_deque_size'] = 15
         self.config['prev_rel_values_deque_size'] = 4
@@ -90,6 +99,7 @@ class Robot(object):
             self.in_vars[i] = new_s_vars[i]
         for i in range(len(new_m_vars)):
             self.out_vars[i] = new_m_vars[i]
+        self.in_var_windows = None
 
         # compute initial action
         self.M0 = Var(self.compute_initial_motor())
@@ -104,18 +114,18 @@ class Robot(object):
 
     def get_possible_action(self, num_sample=50) -> tuple:
 
-        num_dim = len(self.M0.val)
-
-        X = np.zeros((num_sample, num_dim))
-
-        for i in range(num_sample):
-            for x_dim in range(num_dim):
-                X[i, x_dim - 1] = random.uniform(0, self.m_max_val)
+        X = self.get_possible_action_array(num_sample=num_sample)
 
         M_candidates = tuple(set((map(tuple, X))))
 
         return M_candidates
 
+    def get_possible_action_array(self, num_sample=50) -> np.ndarray:
+
+        # one row per candidate action
+        num_dim = len(self.M0.val)
+        return np.random.uniform(0, self.m_max_val, (num_sample, num_dim))
+
     def act(self, M: tuple):
 
         # copy the selected action to the memory
@@ -134,9 +144,23 @@ class Robot(object):
         self.M0.val = tuple(M)
         return self.out_vars
 
+    def __getstate__(self):
+        # the VarWindows belong to the running system; they are created again when needed
+        state = self.__dict__.copy()
+        state['in_var_windows'] = None
+        return state
+
     def wait(self):
+        sleep(self.get_wait_time())
+
+    def get_wait_time(self) -> float:
+        # how long to wait between act and read
         self.curr_wait_time = max(self.sample_speed_limit, self.config['wait_time'])
-        sleep(max(0, self.curr_wait_time))
+
+        # the windows must be there before the wait that they cover
+        if self.config.get('windowed_sampling') and self.S0.val is not None:
+            self._get_in_var_windows()
+        return max(0, self.curr_wait_time)
 
     def read(self, sample_method='average') -> tuple:
 
@@ -202,10 +226,40 @@ class Robot(object):
             in_vals.append(in_val)
         return tuple(in_vals)
 
+    def _get_sample_period(self):
+        # making sure sample_period does not exceed the messenger reading speed
+        return max(self.config['sample_period'], self.sample_speed_limit)
+
+    def _get_in_var_windows(self) -> tuple:
+
+        # the windows cover the wait between act and read (none if there is no wait)
+        window_period = max(0, self.curr_wait_time)
+        if window_period <= 0:
+            return None
+
+        if getattr(self, 'in_var_windows', None) is None or self.in_var_window_period != window_period:
+            self.in_var_windows = tuple(get_var_window(var, window_period) for var in self.in_vars)
+            self.in_var_window_period = window_period
+        return self.in_var_windows
+
+    def _sample_window(self, method) -> tuple:
+
+        # if first run
+        if self.S0.val is None:
+            return self.__sample_current()
+
+        # no wait to aggregate over
+        in_var_windows = self._get_in_var_windows()
+        if in_var_windows is None:
+            return self.__sample_current()
+
+        if method == 'max':
+            return tuple(window.max() for window in in_var_windows)
+        return tuple(window.mean() for window in in_var_windows)
+
     def _sample_few(self) -> tuple:
 
-        # making sure sample_period does not exceed the messenger reading speed
-        sample_period = max(self.config['sample_period'], self.sample_speed_limit)
+        sample_period = self._get_sample_period()
 
         try:
             max_sample_number = max(1, int(sample_period/self.sample_speed_limit))
@@ -242,6 +296,9 @@ class Robot(object):
 
     def _sample_average(self):
 
+        if self.config.get('windowed_sampling'):
+            return self._sample_window('average')
+
         samples = self._sample_few()
 
         # compute average
@@ -254,6 +311,9 @@ class Robot(object):
 
     def _sample_max(self):
 
+        if self.config.get('windowed_sampling'):
+            return self._sample_window('max')
+
         samples = self._sample_few()
         # compute max
         sample_max = []
@@ -0,0 +1,631 @@
+__author__ = 'Matthew'
+
+import math
+import random
+from collections import OrderedDict
+
+import numpy as np
+
+from .cbla_robot import *
+from .cbla_learner import Learner
+from .cbla_engine import CBLA_Engine
+
+
+class VirtualClock(object):
+
+    """
+    Simulated time for running CBLA faster than real time.
+
+    sleep advances the time and steps every Plant added to the clock over the whole duration at once
+    (the Plants solve their dynamics exactly), so the sensor variables change while the robot waits,
+    as they would on the sculpture.
+    The sensor variables are written once at the end of the sleep, since nothing can read them in between.
+    """
+
+    def __init__(self, t0=0.0):
+
+        self.t = t0
+        self.plants = []
+
+    def add_plant(self, plant):
+
+        if not isinstance(plant, Plant):
+            raise TypeError("plant must be of type Plant!")
+        self.plants.append(plant)
+
+    def now(self) -> float:
+        return self.t
+
+    def sleep(self, duration):
+
+        if duration > 0:
+            for plant in self.plants:
+                plant.step(duration)
+            self.t += duration
+
+        for plant in self.plants:
+            plant.write_outputs()
+
+
+class Plant(object):
+
+    """
+    Model of the physical system between some motor variables and some sensor variables.
+
+    step reads the motor variables and advances the model by dt seconds, with the motor variables held over dt.
+    write_outputs writes the sensor variables, with the measurement noise.
+    """
+
+    def __init__(self, noise_std=0.0, seed=None):
+        self.noise_std = noise_std
+        self.random = random.Random(seed)
+
+    def step(self, dt):
+        raise SystemError("step must be implemented in the child class")
+
+    def write_outputs(self):
+        raise SystemError("write_outputs must be implemented in the child class")
+
+    def _noise(self):
+        if self.noise_std > 0:
+            return self.random.gauss(0, self.noise_std)
+        return 0.0
+
+
+class SMA_Thermal_Model(object):
+
+    """
+    First-order thermal model of an SMA wire under the PI temperature control of low_level_node.SMA_Controller,
+    with the log mapping of the temperature reference of low_level_node.Half_Fin.
+
+    T' = K_heating * output - K_dissipate * T, where output = clip(KP * (ref - T) + KI * T_err_sum, 0, 255).
+
+    The controller is taken as continuous, so T is a first-order lag in each of the three regimes of the output
+    (saturated at 255, proportional, off), and step solves it exactly over the whole dt.
+    segments has the pieces of T over the last step --- [(start time, T at the start, T_eq, rate), ...],
+    where T(t) = T_eq + (T at the start - T_eq) * exp(-rate * (t - start time)).
+
+    The integral term is held over each step (KI is small enough that it moves the output by a fraction of a level).
+    T_err_sum grows by the integral of the error over the step divided by control_period,
+    the period of the controller loop, as if the error were summed at every loop.
+    """
+
+    def __init__(self, KP=12, KI=0.0001, K_heating=1.0, K_dissipate=0.22, k_log=52.59, control_period=0.05):
+
+        self.KP = KP
+        self.KI = KI
+        self.K_heating = K_heating
+        self.K_dissipate = K_dissipate
+        self.k_log = k_log
+        self.control_period = control_period
+
+        self.T_model = 0.0
+        self.T_err_sum = 0.0
+        self.output = 0
+        self.segments = []
+
+    def step(self, temp_ref, dt) -> float:
+
+        # same as Half_Fin
+        if temp_ref >= 1:
+            linear_ref = math.log(temp_ref) * self.k_log
+        else:
+            linear_ref = temp_ref
+
+        regimes = self.__get_regimes(linear_ref, self.KI * self.T_err_sum)
+
+        # the regime of T; T is monotonic over the step, so it can only move on to the next regime in its direction
+        T = self.T_model
+        regime_id = 0 if T <= regimes[0][3] else (2 if T >= regimes[2][2] else 1)
+
+        t = 0.0
+        err_integral = 0.0
+        self.segments = []
+        while True:
+            c, rate, T_low, T_high = regimes[regime_id]
+            T_eq = c / rate
+            duration = dt - t
+
+            # the time when T leaves the regime, if it does before the end of the step
+            next_regime_id = None
+            if T_eq > T_high:
+                bound, next_regime_id = T_high, regime_id + 1
+            elif T_eq < T_low:
+                bound, next_regime_id = T_low, regime_id - 1
+            if next_regime_id is not None:
+                t_bound = math.log((T - T_eq) / (bound - T_eq)) / rate
+                if t_bound < duration:
+                    duration = t_bound
+                else:
+                    next_regime_id = None
+
+            self.segments.append((t, T, T_eq, rate))
+            decay = math.exp(-rate * duration)
+            err_integral += (linear_ref - T_eq) * duration - (T - T_eq) * (1 - decay) / rate
+            t += duration
+
+            if next_regime_id is None:
+                T = T_eq + (T - T_eq) * decay
+                break
+            T = bound
+            regime_id = next_regime_id
+
+        self.T_model = T
+        self.T_err_sum += err_integral / self.control_period
+        self.output = int(min(max(0, self.KP * (linear_ref - T) + self.KI * self.T_err_sum), 255))
+
+        return self.T_model
+
+    def __get_regimes(self, linear_ref, output_i) -> tuple:
+        # (K_heating * output + constant part of the output, rate, lowest T, highest T) of each regime
+
+        T_saturated = linear_ref + (output_i - 255) / self.KP
+        T_off = linear_ref + output_i / self.KP
+
+        return ((self.K_heating * 255, self.K_dissipate, -float('inf'), T_saturated),
+                (self.K_heating * (self.KP * linear_ref + output_i), self.K_dissipate + self.K_heating * self.KP,
+                 T_saturated, T_off),
+                (0.0, self.K_dissipate, T_off, float('inf')))
+
+
+class Fin_Plant(Plant):
+
+    """
+    A fin driven by its two half-fin SMA wires, sensed by its 3-axis accelerometer.
+
+    Each wire contracts linearly between T_activation and T_saturation. The left wire pulls the fin
+    one way along x and the right wire the other way; both lift it along y.
+    The accelerometer follows the deflection of the fin with a first-order lag (the inertia of the fin).
+
+    The contraction of each wire is a constant or an exponential between its breakpoints (the changes of regime
+    of its temperature and the crossings of T_activation and T_saturation), so the lag is solved exactly
+    from one breakpoint to the next.
+    """
+
+    def __init__(self, temp_ref_l: Var, temp_ref_r: Var, acc_x: Var, acc_y: Var, acc_z: Var=None,
+                 T_activation=150.0, T_saturation=280.0,
+                 acc_rest=(0.0, -60.0, 230.0), acc_gain=(90.0, 40.0, -20.0), time_constant=1.5,
+                 noise_std=2.0, seed=None, **sma_config):
+
+        super(Fin_Plant, self).__init__(noise_std=noise_std, seed=seed)
+
+        self.temp_ref_l = temp_ref_l
+        self.temp_ref_r = temp_ref_r
+        self.acc_vars = (acc_x, acc_y, acc_z)
+
+        self.sma_l = SMA_Thermal_Model(**sma_config)
+        self.sma_r = SMA_Thermal_Model(**sma_config)
+
+        self.T_activation = T_activation
+        self.T_saturation = T_saturation
+        self.acc_rest = acc_rest
+        self.acc_gain = acc_gain
+        self.time_constant = time_constant
+
+        # deflection of the fin --- (sideways, lift)
+        self.deflection = [0.0, 0.0]
+
+    def contraction(self, T) -> float:
+        return min(max((T - self.T_activation) / (self.T_saturation - self.T_activation), 0.0), 1.0)
+
+    def step(self, dt):
+
+        self.sma_l.step(self.temp_ref_l.val, dt)
+        self.sma_r.step(self.temp_ref_r.val, dt)
+
+        pieces_l = self.__get_contraction_pieces(self.sma_l.segments, dt)
+        pieces_r = self.__get_contraction_pieces(self.sma_r.segments, dt)
+        breakpoints = sorted(set(piece[0] for piece in pieces_l + pieces_r))
+
+        i_l = i_r = 0
+        for t0, t1 in zip(breakpoints, breakpoints[1:] + [dt]):
+
+            # the pieces of the contractions at t0 --- c(t) = A + B * exp(-rate * (t - t0))
+            while i_l + 1 < len(pieces_l) and pieces_l[i_l + 1][0] <= t0:
+                i_l += 1
+            while i_r + 1 < len(pieces_r) and pieces_r[i_r + 1][0] <= t0:
+                i_r += 1
+            A_l, B_l, rate_l = _shift_piece(pieces_l[i_l], t0)
+            A_r, B_r, rate_r = _shift_piece(pieces_r[i_r], t0)
+
+            self.deflection[0] = _lag_step(self.deflection[0], A_l - A_r, ((B_l, rate_l), (-B_r, rate_r)),
+                                           t1 - t0, self.time_constant)
+            self.deflection[1] = _lag_step(self.deflection[1], (A_l + A_r) / 2, ((B_l / 2, rate_l), (B_r / 2, rate_r)),
+                                           t1 - t0, self.time_constant)
+
+    def __get_contraction_pieces(self, segments, dt) -> list:
+        # the contraction over the step --- [(start time, A, B, rate), ...] with c(t) = A + B * exp(-rate * (t - start time))
+
+        width = self.T_saturation - self.T_activation
+
+        pieces = []
+        for i, (t0, T0, T_eq, rate) in enumerate(segments):
+            t_end = segments[i + 1][0] if i + 1 < len(segments) else dt
+
+            # the times when T crosses T_activation and T_saturation in the segment
+            times = [t0]
+            for level in (self.T_activation, self.T_saturation):
+                if min(T0, T_eq) < level < max(T0, T_eq):
+                    t_cross = t0 + math.log((T0 - T_eq) / (level - T_eq)) / rate
+                    if t0 < t_cross < t_end:
+                        times.append(t_cross)
+            times.sort()
+
+            for t_start, t_next in zip(times, times[1:] + [t_end]):
+                T_start = T_eq + (T0 - T_eq) * math.exp(-rate * (t_start - t0))
+                T_next = T_eq + (T0 - T_eq) * math.exp(-rate * (t_next - t0))
+                T_mid = (T_start + T_next) / 2
+                if T_mid <= self.T_activation:
+                    pieces.append((t_start, 0.0, 0.0, 0.0))
+                elif T_mid >= self.T_saturation:
+                    pieces.append((t_start, 1.0, 0.0, 0.0))
+                else:
+                    pieces.append((t_start, (T_eq - self.T_activation) / width, (T_start - T_eq) / width, rate))
+
+        return pieces
+
+    def write_outputs(self):
+
+        targets = (self.deflection[0], self.deflection[1], self.deflection[1])
+        for acc_var, rest, gain, target in zip(self.acc_vars, self.acc_rest, self.acc_gain, targets):
+            if acc_var is not None:
+                acc_var.val = int(min(max(rest + gain * target + self._noise(), -255), 255))
+
+
+def _shift_piece(piece, t) -> tuple:
+    # (A, B, rate) of the piece from time t
+    t_start, A, B, rate = piece
+    return A, B * math.exp(-rate * (t - t_start)), rate
+
+
+def _lag_step(y, A, terms, duration, time_constant) -> float:
+    """
+    Exact solution after duration of the first-order lag y' = (u - y) / time_constant
+    with the input u(t) = A + sum(B * exp(-rate * t)) --- terms = ((B, rate), ...)
+    """
+
+    decay = math.exp(-duration / time_constant)
+    y_end = A + (y - A) * decay
+    for B, rate in terms:
+        if B == 0:
+            continue
+        denominator = 1 - rate * time_constant
+        if abs(denominator) < 1e-9:
+            y_end += B * duration / time_constant * decay
+        else:
+            y_end += B * (math.exp(-rate * duration) - decay) / denominator
+    return y_end
+
+
+class Light_Plant(Plant):
+
+    """
+    LEDs and the ambient light sensors around them.
+
+    - The output of each LED ramps toward its reference like low_level_node.LED_Driver.
+    - Each sensor reads ambient + sum(gain[i][j] * led[j]) through a first-order lag, clipped to 0-4095.
+      The off-diagonal gains couple each sensor to the neighbouring LEDs.
+    - The LED outputs only change at the steps of the LED drivers, so the lag is solved exactly between them,
+      and over the rest of the step at once when every LED has reached its reference.
+
+    The ambient level, the gains and the time constant can be fitted from system identification logs
+    with fit_light_plant.
+    """
+
+    def __init__(self, led_refs: list, als_vars: list, gain=None, ambient=300.0, time_constant=0.3,
+                 led_step_period=0.05, led_incre_k=0.1, noise_std=5.0, seed=None):
+
+        super(Light_Plant, self).__init__(noise_std=noise_std, seed=seed)
+
+        self.led_refs = list(led_refs)
+        self.als_vars = list(als_vars)
+
+        if gain is None:
+            gain = np.full((len(self.als_vars), len(self.led_refs)), 4.0)
+            np.fill_diagonal(gain, 40.0)
+        self.gain = np.asarray(gain, dtype=float)
+        if self.gain.shape != (len(self.als_vars), len(self.led_refs)):
+            raise ValueError("gain must have one row per sensor and one column per LED!")
+
+        self.ambient = ambient
+        self.time_constant = time_constant
+        self.led_step_period = led_step_period
+        self.led_incre_k = led_incre_k
+
+        self.led_out = np.zeros(len(self.led_refs))
+        self.als_state = np.full(len(self.als_vars), float(ambient))
+        self.led_step_time = 0.0
+
+    def step(self, dt):
+
+        led_refs = [led_ref.val for led_ref in self.led_refs]
+
+        # the LED drivers step at their own period, until the outputs reach the references
+        t = 0.0
+        while any(led_out != led_ref for led_out, led_ref in zip(self.led_out, led_refs)):
+            t_next = t + self.led_step_period - self.led_step_time
+            if t_next > dt:
+                break
+
+            self.__step_als(t_next - t)
+            t = t_next
+            self.led_step_time = 0.0
+
+            for j, led_ref in enumerate(led_refs):
+                increment = max(1, int(self.led_out[j] * self.led_incre_k))
+                if self.led_out[j] < led_ref:
+                    self.led_out[j] = min(self.led_out[j] + increment, led_ref, 255)
+                elif self.led_out[j] > led_ref:
+                    self.led_out[j] = max(self.led_out[j] - increment, led_ref, 0)
+
+        self.led_step_time = (self.led_step_time + dt - t) % self.led_step_period
+        self.__step_als(dt - t)
+
+    def __step_als(self, duration):
+
+        target = self.ambient + self.gain.dot(self.led_out)
+        self.als_state = target + (self.als_state - target) * math.exp(-duration / self.time_constant)
+
+    def write_outputs(self):
+
+        for als_var, als_val in zip(self.als_vars, self.als_state):
+            als_var.val = int(min(max(als_val + self._noise(), 0), 4095))
+
+
+def fit_light_plant(t, led, als) -> dict:
+    """
+    Least-squares fit of the first-order LED --> ambient light sensor model of Light_Plant
+    from the samples of one LED and one sensor (e.g. from load_sys_id_light_log).
+
+    The discretized model is als[k+1] = a * als[k] + b * led[k+1] + c, with a = exp(-dt / time_constant),
+    i.e. the LED level is taken as constant over each sample interval.
+    """
+
+    t = np.asarray(t, dtype=float)
+    led = np.asarray(led, dtype=float)
+    als = np.asarray(als, dtype=float)
+    if not len(t) == len(led) == len(als) or len(t) < 4:
+        raise ValueError("t, led and als must have the same length (at least 4 samples)!")
+
+    dt = float(np.median(np.diff(t)))
+    X = np.column_stack((als[:-1], led[1:], np.ones(len(als) - 1)))
+    a, b, c = np.linalg.lstsq(X, als[1:], rcond=-1)[0]
+
+    # a must be in (0, 1) for a stable first-order lag
+    a = min(max(a, 1e-6), 1 - 1e-6)
+
+    return {'ambient': c / (1 - a), 'gain': b / (1 - a), 'time_constant': -dt / math.log(a)}
+
+
+def load_sys_id_light_log(log_dir, packet_name, log_header='sys_id_data', log_name=None) -> tuple:
+    """
+    Returns the time, LED and ambient light sensor samples of packet_name (e.g. 'c1.light_0')
+    recorded by system_identification.py --- (t, led, als)
+    """
+
+    log_sessions, _ = DataLogger.retrieve_data(log_dir=log_dir, log_header=log_header, log_name=log_name)
+
+    packets = []
+    for session_log in log_sessions:
+        node_data = session_log.get(packet_name)
+        if not isinstance(node_data, dict) or DataLogger.packet_default_type not in node_data:
+            continue
+        for data_block in node_data[DataLogger.packet_default_type].values():
+            packets += data_block
+
+    if not packets:
+        raise KeyError("%s cannot be found in the log!" % packet_name)
+
+    packets = sorted(packets, key=lambda packet: packet[DataLogger.packet_time_key])
+    t = np.array([packet[DataLogger.packet_time_key] for packet in packets])
+    led = np.array([packet['led'] for packet in packets])
+    als = np.array([packet['als'] for packet in packets])
+
+    return t, led, als
+
+
+class Simulated_Robot(Robot):
+
+    """
+    Robot whose waiting and sampling run on a VirtualClock, so the Plants advance instead of the wall clock.
+
+    Mix it in front of a Robot class (see Simulated_Robot_Light etc.) to keep that class's configuration.
+    The sensor variables are sampled sample_number times, evenly spread over the sample period after the wait.
+    wait takes the samples when the robot is stepped on its own (CBLA_Engine.update);
+    Simulated_Fleet_Engine takes them on the shared timeline of all the robots instead.
+    """
+
+    def __init__(self, in_vars: list, out_vars: list, virtual_clock: VirtualClock, **config_kwargs):
+
+        if not isinstance(virtual_clock, VirtualClock):
+            raise TypeError("virtual_clock must be of type VirtualClock!")
+        self.virtual_clock = virtual_clock
+
+        # samples of the sensor variables taken since the last read
+        self.samples = []
+
+        super(Simulated_Robot, self).__init__(in_vars, out_vars, **config_kwargs)
+
+    def _set_default_config(self):
+        super(Simulated_Robot, self)._set_default_config()
+        self.config['windowed_sampling'] = False
+
+    def wait(self):
+
+        self.virtual_clock.sleep(self.get_wait_time())
+
+        t = 0.0
+        for sample_time in self.get_sample_times():
+            self.virtual_clock.sleep(sample_time - t)
+            t = sample_time
+            self.take_sample()
+
+    def get_sample_times(self) -> list:
+        '''Returns the times of the samples after the wait (none in the first run, which reads the current values)'''
+
+        if self.S0.val is None:
+            return []
+
+        sample_period = self._get_sample_period()
+        sample_number = max(1, self.config['sample_number'])
+        return [sample_period * (i + 1) / sample_number for i in range(sample_number)]
+
+    def take_sample(self):
+        self.samples.append(tuple(var.val for var in self.in_vars))
+
+    def _sample_few(self) -> tuple:
+
+        if not self.samples:
+            return (tuple(var.val for var in self.in_vars), )
+
+        samples = tuple(self.samples)
+        self.samples = []
+        return samples
+
+
+class Simulated_Fleet_Engine(object):
+
+    """
+    Steps the CBLA_Engines of simulated robots together on their VirtualClock, like CBLA_Fleet_Engine,
+    since the nodes run concurrently on the sculpture.
+
+    - All the robots act, then the clock advances once for all of them (the longest wait and sample period),
+      then all the robots read. Each robot takes its samples over the end of that time, so that they all read at once.
+    - Each learner learns and selects its action on its own, since the robots can have different S and M dimensions.
+    - update returns the data packets of the engines --- OrderedDict of node_name --> data packet
+    """
+
+    def __init__(self, virtual_clock: VirtualClock, engines: OrderedDict):
+
+        if not isinstance(virtual_clock, VirtualClock):
+            raise TypeError("virtual_clock must be of type VirtualClock!")
+        self.virtual_clock = virtual_clock
+
+        self.engines = OrderedDict(engines)
+        for engine in self.engines.values():
+            if not isinstance(engine.robot, Simulated_Robot) or engine.robot.virtual_clock is not virtual_clock:
+                raise TypeError("The robots must be Simulated_Robots on virtual_clock!")
+
+    def update(self) -> OrderedDict:
+
+        t0 = clock()
+
+        snapshots = []
+        for engine in self.engines.values():
+            engine.update_count += 1
+            snapshots.append(engine.check_snapshot(t0))
+
+        # act
+        for engine in self.engines.values():
+            with engine.robot_lock:
+                engine.robot.act(engine.M)
+                engine.robot.samples = []
+
+        # wait and sample, on one timeline for all the robots
+        sample_times_list = []
+        step_time = 0.0
+        for engine in self.engines.values():
+            with engine.robot_lock:
+                wait_time = max(0.0, engine.robot.get_wait_time())
+                sample_times = engine.robot.get_sample_times()
+            sample_times_list.append(sample_times)
+            step_time = max(step_time, wait_time + (sample_times[-1] if sample_times else 0.0))
+
+        schedule = []
+        for i, sample_times in enumerate(sample_times_list):
+            if sample_times:
+                offset = step_time - sample_times[-1]
+                schedule += [(offset + sample_time, i) for sample_time in sample_times]
+        schedule.sort()
+
+        robots = [engine.robot for engine in self.engines.values()]
+        t = 0.0
+        for sample_time, i in schedule:
+            if sample_time > t:
+                self.virtual_clock.sleep(sample_time - t)
+                t = sample_time
+            robots[i].take_sample()
+        if step_time > t or not schedule:
+            self.virtual_clock.sleep(step_time - t)
+
+        # read
+        S2_list = []
+        for engine in self.engines.values():
+            with engine.robot_lock:
+                S2_list.append(engine.robot.read())
+
+        data_packets = OrderedDict()
+        for (node_name, engine), S2, snapshot in zip(self.engines.items(), S2_list, snapshots):
+
+            with engine.learner_lock:
+                # learn
+                engine.learner.learn(S2, engine.M)
+
+                # select action
+                with engine.robot_lock:
+                    engine.M = engine.learner.select_action(engine.robot)
+
+                # predict
+                S_predicted = engine.learner.predict()
+
+            data_packets[node_name] = engine.make_data_packet(S2, S_predicted, t0, snapshot)
+
+        return data_packets
+
+
+class Simulated_Robot_Light(Simulated_Robot, Robot_Light):
+    pass
+
+
+class Simulated_Robot_HalfFin(Simulated_Robot, Robot_HalfFin):
+    pass
+
+
+class Simulated_Robot_Reflex(Simulated_Robot, Robot_Reflex):
+    pass
+
+
+def build_simulated_engines(num_fins=3, num_lights=3, seed=None, learner_config=None):
+    """
+    Builds the simulated half-fin and light nodes of one cluster, the same as the isolated nodes
+    of cbla_triplet_main --- (virtual clock, OrderedDict of node_name --> CBLA_Engine)
+    """
+
+    if not isinstance(learner_config, dict):
+        learner_config = dict()
+
+    rand = random.Random(seed)
+    virtual_clock = VirtualClock()
+    engines = OrderedDict()
+
+    def add_engine(node_name, robot):
+        S0 = robot.read()
+        learner = Learner(S0, robot.compute_initial_motor(), **learner_config)
+        engines[node_name] = CBLA_Engine(robot, learner)
+
+    # ===== Half-Fin nodes =====
+    for j in range(num_fins):
+        ir = Var(rand.randint(0, 300))
+        acc = (Var(0), Var(0), Var(0))
+        temp_ref = {'l': Var(0), 'r': Var(0)}
+        virtual_clock.add_plant(Fin_Plant(temp_ref['l'], temp_ref['r'], *acc, seed=rand.random()))
+
+        for side in ('l', 'r'):
+            robot = Simulated_Robot_HalfFin([ir, acc[0], acc[1]], [temp_ref[side]], virtual_clock,
+                                            s_ranges=((0, 4095), (-255, 255), (-255, 255)),
+                                            m_ranges=((0, 300),))
+            add_engine('sim.cbla_halfFin_%d-%s' % (j, side), robot)
+
+    # ===== Light nodes =====
+    led_refs = [Var(0) for _ in range(num_lights)]
+    als_vars = [Var(0) for _ in range(num_lights)]
+    virtual_clock.add_plant(Light_Plant(led_refs, als_vars, seed=rand.random()))
+    for j in range(num_lights):
+        robot = Simulated_Robot_Light([als_vars[j]], [led_refs[j]], virtual_clock,
+                                      s_ranges=((0, 4095),), m_ranges=((0, 50),))
+        add_engine('sim.cbla_light_%d' % j, robot)
+
+    # let the plants settle
+    virtual_clock.sleep(1.0)
+
+    return virtual_clock, engines
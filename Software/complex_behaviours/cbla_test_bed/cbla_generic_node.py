@@ -35,6 +35,7 @@ class CBLA_Base_Node(Node):
         # cbla robots and learner
         self.cbla_robot = None
         self.cbla_learner = None
+        self.cbla_engine = None
 
         # parameters
         self.state_save_period = 30.0 # seconds
@@ -57,7 +58,10 @@ class CBLA_Base_Node(Node):
 
         self.prescripted_engine = prescripted_engine
 
-    def instantiate(self, cbla_robot: cbla_engine.Robot, learner_config=None):
+        # the CBLA_Fleet_Node that steps this node's engine (None if the node runs its own engine)
+        self.fleet_node = None
+
+    def instantiate(self, cbla_robot: cbla_engine.Robot, learner_config=None, learner_pool=None):
 
         if isinstance(cbla_robot, cbla_engine.Robot):
             self.cbla_robot = cbla_robot
@@ -89,7 +93,12 @@ class CBLA_Base_Node(Node):
                 pass
 
         # create CBLA engine
-        self.cbla_engine = cbla_engine.CBLA_Engine(self.cbla_robot, self.cbla_learner, **config)
+        if isinstance(learner_pool, cbla_engine.LearnerPool):
+            # the learner is run by one of the worker processes of the pool
+            self.cbla_learner = learner_pool.add_learner(self.cbla_learner)
+            self.cbla_engine = cbla_engine.CBLA_Pooled_Engine(self.cbla_robot, self.cbla_learner, **config)
+        else:
+            self.cbla_engine = cbla_engine.CBLA_Engine(self.cbla_robot, self.cbla_learner, **config)
 
         # internal output variables
         self.out_var['S'] = self.cbla_robot.S0
@@ -100,16 +109,11 @@ class CBLA_Base_Node(Node):
 
     def run(self):
 
-        # add information about the robot's label to data_collector
-        label_info = dict()
-        label_info[DataLogger.info_type_key] = 'label_names'
-        if 's_name' in self.cbla_robot.config:
-            label_info['input_label_name'] = self.cbla_robot.config['s_names']
-        if 'm_name' in self.cbla_robot.config:
-            label_info['output_label_name'] = self.cbla_robot.config['m_names']
+        # the engine is stepped by the fleet instead
+        if self.fleet_node is not None:
+            return
 
-        if label_info:
-            self.data_logger.write_info(node_name=self.node_name, info_data=label_info)
+        self.write_label_info()
 
         last_save_states_time = clock()
         while self.alive:
@@ -156,6 +160,107 @@ class CBLA_Base_Node(Node):
 
         self.data_logger.write_info(self.node_name, self.cbla_states)
 
+    def write_label_info(self):
+
+        # add information about the robot's label to data_collector
+        label_info = dict()
+        label_info[DataLogger.info_type_key] = 'label_names'
+        if 's_name' in self.cbla_robot.config:
+            label_info['input_label_name'] = self.cbla_robot.config['s_names']
+        if 'm_name' in self.cbla_robot.config:
+            label_info['output_label_name'] = self.cbla_robot.config['m_names']
+
+        if label_info:
+            self.data_logger.write_info(node_name=self.node_name, info_data=label_info)
+
+
+class CBLA_Fleet_Node(Node):
+
+    """
+    Runs the CBLA engines of many CBLA nodes (with the same kind of robot) in one thread, with a CBLA_Fleet_Engine.
+
+    The member nodes must be instantiated. They are still started as usual, but their own run returns right away.
+    The data packets and the states are still saved under the name of each member node.
+    When the prescripted mode is active, the members with a prescripted engine run it instead,
+    one after the other, and the rest of the fleet carries on with CBLA.
+    """
+
+    def __init__(self, messenger: Messenger, data_logger: DataLogger, cbla_nodes: list, node_name='cbla_fleet'):
+
+        super(CBLA_Fleet_Node, self).__init__(messenger, node_name=node_name)
+
+        self.data_logger = data_logger
+
+        self.cbla_nodes = list(cbla_nodes)
+        for cbla_node in self.cbla_nodes:
+            if not isinstance(cbla_node, CBLA_Base_Node):
+                raise TypeError("cbla_nodes must be a list of CBLA_Base_Node!")
+            if cbla_node.cbla_engine is None:
+                raise AttributeError("%s must be instantiated before joining a fleet." % cbla_node.node_name)
+            cbla_node.fleet_node = self
+
+        # parameters
+        self.state_save_period = 30.0 # seconds
+
+        # (indices of the members running CBLA) --> CBLA_Fleet_Engine
+        self.fleet_engines = dict()
+
+    def run(self):
+
+        for cbla_node in self.cbla_nodes:
+            cbla_node.write_label_info()
+
+        last_save_states_time = clock()
+        while self.alive:
+            # adjust the robot's wait time between act() and read()
+            speed_limit = self.messenger.estimated_msg_period * 2
+
+            # members that run their prescripted engine in this tick
+            cbla_indices = []
+            for i, cbla_node in enumerate(self.cbla_nodes):
+                if isinstance(cbla_node.prescripted_engine, ps_engine.Prescripted_Base_Engine) and \
+                   cbla_node.prescripted_mode_active.val:
+
+                    data_packet = cbla_node.prescripted_engine.update()
+                    data_packet[DataLogger.packet_type_key] = CBLA_Base_Node.prescripted_data_type_key
+                    self.data_logger.append_data_packet(cbla_node.node_name, data_packet)
+                else:
+                    cbla_node.cbla_robot.sample_speed_limit = speed_limit
+                    cbla_indices.append(i)
+
+            if not cbla_indices:
+                sleep(speed_limit)
+                continue
+
+            # update the CBLA Engines of the rest of the fleet together
+            fleet_engine = self.get_fleet_engine(tuple(cbla_indices))
+            data_packets = fleet_engine.update()
+
+            for i, data_packet in zip(cbla_indices, data_packets):
+                data_packet[DataLogger.packet_type_key] = CBLA_Base_Node.cbla_data_type_key
+
+                # save the data
+                self.data_logger.append_data_packet(self.cbla_nodes[i].node_name, data_packet)
+
+            # save state periodically
+            curr_time = clock()
+            if curr_time - last_save_states_time > self.state_save_period:
+                self.save_states()
+                last_save_states_time = curr_time
+
+        self.save_states()
+
+    def get_fleet_engine(self, cbla_indices: tuple) -> cbla_engine.CBLA_Fleet_Engine:
+
+        if cbla_indices not in self.fleet_engines:
+            engines = [self.cbla_nodes[i].cbla_engine for i in cbla_indices]
+            self.fleet_engines[cbla_indices] = cbla_engine.CBLA_Fleet_Engine(engines)
+        return self.fleet_engines[cbla_indices]
+
+    def save_states(self):
+        for cbla_node in self.cbla_nodes:
+            cbla_node.save_states()
+
 
 class CBLA_Generic_Node(CBLA_Base_Node):
 
@@ -227,7 +332,7 @@ class CBLA_Generic_Node(CBLA_Base_Node):
         else:
             self.robot_config = robot_config
 
-    def instantiate(self, cbla_robot: cbla_engine.Robot=None, learner_config=None):
+    def instantiate(self, cbla_robot: cbla_engine.Robot=None, learner_config=None, learner_pool=None):
         if cbla_robot == None:
             if self.past_state:
                 try:
@@ -253,7 +358,8 @@ class CBLA_Generic_Node(CBLA_Base_Node):
         if learner_config == None:
             learner_config = self._get_learner_config()
 
-        super(CBLA_Generic_Node, self).instantiate(cbla_robot=cbla_robot, learner_config=learner_config)
+        super(CBLA_Generic_Node, self).instantiate(cbla_robot=cbla_robot, learner_config=learner_config,
+                                                   learner_pool=learner_pool)
 
     def add_in_var(self, var: Var, var_key: str, var_range:tuple=None, var_name:str=None):
 
@@ -0,0 +1,52 @@
+'''Runs the CBLA engines of one simulated cluster faster than real time, without the sculpture.'''
+
+import sys
+import random
+from time import perf_counter
+
+import numpy as np
+
+import cbla_engine
+
+
+def run_simulation(num_steps=1000, seed=0, print_every=0, **sim_config):
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    virtual_clock, engines = cbla_engine.build_simulated_engines(seed=seed, **sim_config)
+
+    # the nodes run concurrently on the sculpture, so they are stepped together
+    fleet_engine = cbla_engine.Simulated_Fleet_Engine(virtual_clock, engines)
+
+    t0 = perf_counter()
+    for step in range(1, num_steps + 1):
+        data_packets = fleet_engine.update()
+        if print_every and step % print_every == 0:
+            for node_name, data_packet in data_packets.items():
+                cbla_engine.CBLA_Engine.print_data_packet(data_packet, header='%s (t = %.1fs)' % (node_name, virtual_clock.now()))
+    wall_time = perf_counter() - t0
+
+    num_updates = num_steps * len(engines)
+    print('%d CBLA steps of %d nodes in %.2fs (%.0f steps/s); simulated time: %.0fs' %
+          (num_steps, len(engines), wall_time, num_updates / max(wall_time, 1e-9), virtual_clock.now()))
+
+    for node_name, engine in engines.items():
+        print('%s: %d experts' % (node_name, engine.learner.expert_tree.num_leaves))
+
+    return virtual_clock, engines
+
+
+if __name__ == "__main__":
+
+    # number of CBLA steps of each node
+    num_steps = 1000
+    if len(sys.argv) > 1:
+        num_steps = int(sys.argv[1])
+
+    # random seed
+    seed = 0
+    if len(sys.argv) > 2:
+        seed = int(sys.argv[2])
+
+    run_simulation(num_steps=num_steps, seed=seed)
@@ -14,7 +14,7 @@ from abstract_node import *
 import cbla_generic_node as cbla_base
 from cbla_isolated_node import *
 
-from cbla_engine import cbla_robot
+from cbla_engine import cbla_robot, LearnerPool
 import prescripted_engine as ps_engine
 from node_spatial_map import NodeSpatialMap as NodeMap
 
@@ -29,7 +29,7 @@ class CBLA(interactive_system.InteractiveCmd):
 
     def __init__(self, Teensy_manager, auto_start=True, mode='isolated',
                  create_new_log=True, log_dir_path=None,
-                 start_prescripted=False, in_user_study=False):
+                 start_prescripted=False, in_user_study=False, use_fleet=False, use_learner_pool=False):
 
         # setting up the data collector
         if not isinstance(log_dir_path, str):
@@ -66,6 +66,15 @@ class CBLA(interactive_system.InteractiveCmd):
         self.in_user_study = in_user_study
         self.user_study_vars = OrderedDict()
 
+        # step the CBLA nodes of the same kind together in one CBLA_Fleet_Node each
+        self.use_fleet = use_fleet
+
+        # run the CBLA learners in worker processes instead of the node threads
+        self.use_learner_pool = use_learner_pool
+        self.learner_pool = None
+        if use_fleet and use_learner_pool:
+            raise ValueError("The learners of a fleet cannot be run in a learner pool.")
+
         # Condition variable indicating that all nodes are created
         self.all_nodes_created = threading.Condition()
 
@@ -77,7 +86,7 @@ class CBLA(interactive_system.InteractiveCmd):
         # prescripted_engine active-or-not var
         self.prescripted_mode_active_var = Var(start_prescripted)
 
-        super(CBLA, self).__init__(Teensy_manager, auto_start=auto_start)
+        super(CBLA, self).__init__(Teensy_manager, auto_start=auto_start, batched=True)
 
     # ========= the Run function for the CBLA system based on the abstract node system=====
     def run(self):
@@ -150,13 +159,19 @@ class CBLA(interactive_system.InteractiveCmd):
         self.node_map = self.build_node_map()
 
         # instantiate the node after the linking process
+        if self.use_learner_pool:
+            self.learner_pool = LearnerPool()
         for cbla_node in cbla_nodes.values():
             if isinstance(cbla_node, CBLA_Generic_Node):
-                cbla_node.instantiate()
+                cbla_node.instantiate(learner_pool=self.learner_pool)
 
         # add cbla nodes in to the node_list
         self.node_list.update(cbla_nodes)
 
+        # group the cbla nodes into fleets
+        if self.use_fleet:
+            self.node_list.update(self.build_fleet_nodes(cbla_nodes))
+
         # add user study panel to the node_list
         if self.in_user_study:
             for node_name, node in self.node_list.items():
@@ -195,9 +210,8 @@ class CBLA(interactive_system.InteractiveCmd):
         # start running nodes
         self.start_nodes()
 
-        # wait for the nodes to destroy
-        for node in self.node_list.values():
-            node.join()
+        # wait for the nodes to destroy (the scheduled nodes are not threads that can be joined)
+        self.node_scheduler.join_nodes()
 
         return 0
 
@@ -495,6 +509,24 @@ class CBLA(interactive_system.InteractiveCmd):
 
         return cbla_nodes
 
+    def build_fleet_nodes(self, cbla_nodes):
+
+        # nodes with the same robot class and the same S and M dimensions can share one fleet
+        fleets = OrderedDict()
+        for cbla_node in cbla_nodes.values():
+            if not isinstance(cbla_node, CBLA_Generic_Node) or cbla_node.cbla_engine is None:
+                continue
+            fleet_key = (cbla_node.robot_class.__name__, len(cbla_node.s_keys), len(cbla_node.m_keys))
+            fleets.setdefault(fleet_key, []).append(cbla_node)
+
+        fleet_nodes = OrderedDict()
+        for (robot_class_name, s_dim, m_dim), members in fleets.items():
+            fleet_name = 'cbla_fleet_%s_s%d_m%d' % (robot_class_name, s_dim, m_dim)
+            fleet_node = cbla_base.CBLA_Fleet_Node(self.messenger, self.data_logger, members, node_name=fleet_name)
+            fleet_nodes[fleet_node.node_name] = fleet_node
+
+        return fleet_nodes
+
     def link_spatial_locally(self, cbla_nodes):
 
         for node_key, cbla_node in cbla_nodes.items():
@@ -954,10 +986,13 @@ class CBLA(interactive_system.InteractiveCmd):
                 not isinstance(self.messenger, interactive_system.Messenger):
             raise AttributeError("Nodes have not been created properly!")
 
+        # Nodes that define step share a small pool of threads; the others run in their own thread
+        self.node_scheduler = NodeScheduler(num_workers=4)
         for name, node in self.node_list.items():
-            node.start()
+            self.node_scheduler.add_node(node)
             print('%s initialized' % name)
-        print('System Initialized with %d nodes' % len(self.node_list))
+        print('System Initialized with %d nodes (%d scheduled)' % (len(self.node_list),
+                                                                   len(self.node_scheduler.node_list)))
 
         # start the Data Collector
         self.data_logger.start()
@@ -988,10 +1023,16 @@ class CBLA(interactive_system.InteractiveCmd):
         # killing each of the Node
         for node in self.node_list.values():
             node.alive = False
+        self.node_scheduler.join_nodes()
+        self.node_scheduler.stop()
         for node in self.node_list.values():
-            node.join()
             print('%s is terminated.' % node.node_name)
 
+        # the nodes have saved their learners' states
+        if self.learner_pool is not None:
+            self.learner_pool.stop()
+            print("Learner Pool is terminated.")
+
         # terminating the data_collection thread
         self.data_logger.end_data_collection()
         self.data_logger.join()
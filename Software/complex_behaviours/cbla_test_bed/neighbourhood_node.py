@@ -24,23 +24,20 @@ class Cluster_Activity(Node):
             for name, arg in config.items():
                 self.config[name] = arg
 
-    def run(self):
+    def step(self):
 
         activity_denom = float(len(self.in_var))
-        while self.alive:
 
-            # determine level of activity
-            activity = 0
-            for var in self.in_var.values():
-                activity += (var.val > 0.5)
-            activity = max(0, min(activity_denom, activity))
-
-            prob = self.gaussian_function(activity, a=self.config['max_prob'], b=activity_denom/2, c=activity_denom/10)
+        # determine level of activity
+        activity = 0
+        for var in self.in_var.values():
+            activity += (var.val > 0.5)
+        activity = max(0, min(activity_denom, activity))
 
-            self.out_var['local_prob'].val = max(self.config['min_prob'], min(self.config['max_prob'], prob ))
-            # print('activity', activity, '  denom', activity_denom, '  prob', prob)
+        prob = self.gaussian_function(activity, a=self.config['max_prob'], b=activity_denom/2, c=activity_denom/10)
 
-            sleep(max(0, self.messenger.estimated_msg_period * 2))
+        self.out_var['local_prob'].val = max(self.config['min_prob'], min(self.config['max_prob'], prob ))
+        # print('activity', activity, '  denom', activity_denom, '  prob', prob)
 
     @staticmethod
     def gaussian_function(x, a, b, c):
@@ -2,6 +2,9 @@ __author__ = 'Matthew'
 
 from .basic_gui import *
 from .node import *
+from .node_scheduler import *
+from .var_window import *
 from .low_level_node import *
 from .data_logger import *
+from .log_reader import *
 from .panel_node import *
@@ -0,0 +1,382 @@
+__author__ = 'Matthew'
+
+import os
+import mmap
+import pickle
+import struct
+import zlib
+from itertools import chain
+
+import numpy as np
+
+
+class ColumnStore(object):
+
+    """
+    Append-only columnar storage of blocks of data packets (lists of dicts), keyed by block key like a shelf.
+
+    - Each block is written as one chunk at the end of the current segment file (segment_000000.seg, ...).
+      The chunk is a small schema header (the field names, their kinds, dtypes and shapes),
+      followed by one column per field, so the field names are stored once per block instead of once per packet.
+    - Columns of numbers, bools or tuples of numbers of a single type are stored as fixed-dtype arrays
+      (int64 for ints, float64 for floats, and the dtype of numpy scalars, which are read back as numpy scalars).
+      Other columns (e.g. dicts, or a mix of ints and floats) are pickled together and compressed,
+      so every value is read back with its type.
+      A field that is missing in some of the packets has a bit mask of the packets that have it.
+    - Every chunk gets a record (block key, segment, offset, size, time range) appended to the block index file,
+      so blocks are read back without scanning the segments.
+      The time range is the (min, max) of the time_key field of the packets, or None.
+    - A new segment is started when the current one is larger than max_segment_size.
+    - The segments are read through memory maps, and a single column of a block can be read
+      without decoding the rest of the block (get_column); number columns are then views into the map.
+
+    Values that are not lists of dicts are pickled as a whole. If a key is written again, the latest block wins.
+    """
+
+    index_file_name = 'block_index'
+    segment_name_fmt = 'segment_%06d.seg'
+
+    def __init__(self, dir_path, flag='c', max_segment_size=64 * 2**20, time_key=None):
+
+        self.dir_path = dir_path
+        self.flag = flag
+        self.max_segment_size = max_segment_size
+        self.time_key = time_key
+
+        if flag != 'r' and not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+
+        # block key --> (segment name, offset, size, time range)
+        self.index = dict()
+        self.num_segments = 0
+        self.__load_index()
+
+        # the files are opened on the first write, so that an unused ColumnStore can be passed to another process
+        self.__segment_file = None
+        self.__index_file = None
+
+        # segment name --> memory map of the segment
+        self.__segment_maps = dict()
+
+    @classmethod
+    def exists(cls, dir_path) -> bool:
+        return os.path.isfile(os.path.join(dir_path, cls.index_file_name))
+
+    def __setitem__(self, block_key: str, block_data):
+
+        if self.flag == 'r':
+            raise PermissionError("ColumnStore was opened as read-only!")
+
+        chunk = encode_block(block_data)
+
+        segment_file = self.__get_segment_file(len(chunk))
+        offset = segment_file.tell()
+        segment_file.write(chunk)
+        segment_file.flush()
+
+        time_range = _get_time_range(block_data, self.time_key)
+        record = (block_key, self.segment_name_fmt % (self.num_segments - 1), offset, len(chunk), time_range)
+        pickle.dump(record, self.__index_file, protocol=3)
+        self.__index_file.flush()
+
+        self.index[block_key] = record[1:]
+
+    def __getitem__(self, block_key: str):
+        return decode_block(self.__get_chunk(block_key))
+
+    def get_time_range(self, block_key: str):
+        return self.index[block_key][3]
+
+    def get_schema(self, block_key: str) -> dict:
+        return _read_header(self.__get_chunk(block_key))[0]
+
+    def get_column(self, block_key: str, name: str) -> tuple:
+        '''
+        Returns the rows of the packets of the block that have the field and their values --- (rows, values).
+        The values are an array for number, bool and tuple columns (tuples are rows of a 2D array), or a list.
+        rows is None if every packet has the field.
+        '''
+
+        schema, payload = _read_header(self.__get_chunk(block_key))
+        if schema['kind'] != 'packets':
+            raise KeyError("%s is not a block of packets!" % block_key)
+
+        for column in _iter_columns(schema, payload):
+            if column[0] == name:
+                return _decode_column(schema['num_rows'], *column[1:])
+
+        raise KeyError("%s has no field %s!" % (block_key, name))
+
+    def __contains__(self, block_key):
+        return block_key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def keys(self):
+        return self.index.keys()
+
+    def items(self):
+        for block_key in list(self.index.keys()):
+            yield block_key, self[block_key]
+
+    def close(self):
+
+        for segment_map in self.__segment_maps.values():
+            try:
+                segment_map.close()
+            # columns read from the map are still in use
+            except BufferError:
+                pass
+        self.__segment_maps = dict()
+
+        if self.__segment_file is not None:
+            self.__segment_file.close()
+            self.__segment_file = None
+        if self.__index_file is not None:
+            self.__index_file.close()
+            self.__index_file = None
+
+    def __load_index(self):
+
+        index_path = os.path.join(self.dir_path, self.index_file_name)
+        if not os.path.isfile(index_path):
+            return
+
+        with open(index_path, 'rb') as index_file:
+            while True:
+                try:
+                    record = pickle.load(index_file)
+                # end of the index (or a record cut short when the program was killed)
+                except (EOFError, pickle.UnpicklingError, ValueError):
+                    break
+                # records written without a time range
+                if len(record) < 5:
+                    record = tuple(record) + (None,)
+                self.index[record[0]] = tuple(record[1:])
+
+        segment_names = set(record[0] for record in self.index.values())
+        while self.segment_name_fmt % self.num_segments in segment_names:
+            self.num_segments += 1
+
+    def __get_chunk(self, block_key) -> memoryview:
+
+        segment_name, offset, size = self.index[block_key][:3]
+
+        # map the segment again if it has grown since it was mapped
+        segment_map = self.__segment_maps.get(segment_name)
+        if segment_map is None or offset + size > len(segment_map):
+            with open(os.path.join(self.dir_path, segment_name), 'rb') as segment_file:
+                segment_map = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__segment_maps[segment_name] = segment_map
+
+        return memoryview(segment_map)[offset:offset + size]
+
+    def __get_segment_file(self, chunk_size):
+
+        if self.__index_file is None:
+            self.__index_file = open(os.path.join(self.dir_path, self.index_file_name), 'ab')
+
+        # start a new segment if there is none or the current one is full
+        if self.__segment_file is None or \
+                (self.__segment_file.tell() > 0 and self.__segment_file.tell() + chunk_size > self.max_segment_size):
+            if self.__segment_file is not None:
+                self.__segment_file.close()
+            self.__segment_file = open(os.path.join(self.dir_path, self.segment_name_fmt % self.num_segments), 'ab')
+            self.num_segments += 1
+
+        return self.__segment_file
+
+
+# chunk layout: header length, header (pickled schema), columns
+_header_len_fmt = '<I'
+_header_len_size = struct.calcsize(_header_len_fmt)
+
+
+def encode_block(block_data) -> bytes:
+
+    if isinstance(block_data, list) and block_data and all(isinstance(packet, dict) for packet in block_data):
+        schema, columns = _encode_packets(block_data)
+    else:
+        schema = {'kind': 'object'}
+        columns = [pickle.dumps(block_data, protocol=3)]
+
+    header = pickle.dumps(schema, protocol=3)
+    return b''.join([struct.pack(_header_len_fmt, len(header)), header] + columns)
+
+
+def decode_block(chunk: bytes):
+
+    schema, payload = _read_header(chunk)
+
+    if schema['kind'] == 'object':
+        return pickle.loads(payload)
+
+    return _decode_packets(schema, payload)
+
+
+def _read_header(chunk: bytes) -> tuple:
+
+    chunk = memoryview(chunk)
+    header_len, = struct.unpack_from(_header_len_fmt, chunk)
+    schema = pickle.loads(chunk[_header_len_size:_header_len_size + header_len])
+
+    return schema, chunk[_header_len_size + header_len:]
+
+
+def _get_time_range(block_data, time_key):
+
+    if time_key is None or not isinstance(block_data, list):
+        return None
+
+    times = [packet[time_key] for packet in block_data if isinstance(packet, dict) and time_key in packet]
+    if not times:
+        return None
+    return min(times), max(times)
+
+
+def _encode_packets(packets: list) -> tuple:
+
+    num_rows = len(packets)
+
+    # field names in the order they first appear
+    field_names = []
+    seen_names = set()
+    for packet in packets:
+        for name in packet:
+            if name not in seen_names:
+                seen_names.add(name)
+                field_names.append(name)
+
+    columns_schema = []
+    columns = []
+    for name in field_names:
+
+        present = [name in packet for packet in packets]
+        values = [packet[name] for packet in packets if name in packet]
+
+        if all(present):
+            mask = b''
+        else:
+            mask = np.packbits(np.array(present, dtype=bool)).tobytes()
+
+        kind, data = _encode_column(values)
+        if kind == 'object':
+            dtype_str = None
+            shape = None
+        else:
+            dtype_str = data.dtype.str
+            shape = data.shape[1:]
+            data = data.tobytes()
+
+        columns_schema.append((name, kind, dtype_str, shape, len(mask), len(data)))
+        columns.append(mask)
+        columns.append(data)
+
+    schema = {'kind': 'packets', 'num_rows': num_rows, 'columns': columns_schema}
+    return schema, columns
+
+
+def _encode_column(values: list) -> tuple:
+    '''
+    Returns the kind of the column and its data: an array for scalar and tuple columns, or compressed bytes.
+    The kind is 'np_scalar' or 'np_tuple' if the values are numpy scalars.
+    '''
+
+    # checking the set of types is much faster than checking every value
+    value_types = set(map(type, values))
+
+    if len(value_types) == 1:
+        value_type = next(iter(value_types))
+
+        array = _to_array(values, value_type)
+        if array is not None:
+            return ('np_scalar' if issubclass(value_type, np.generic) else 'scalar'), array
+
+        if value_type is tuple and len(set(map(len, values))) == 1:
+            element_types = set(map(type, chain.from_iterable(values)))
+            if len(element_types) == 1:
+                element_type = next(iter(element_types))
+                array = _to_array(values, element_type)
+                if array is not None:
+                    return ('np_tuple' if issubclass(element_type, np.generic) else 'tuple'), array
+
+    return 'object', zlib.compress(pickle.dumps(values, protocol=3), 1)
+
+
+# python types that are read back as they were from arrays of these dtypes
+_python_dtypes = {bool: np.bool_, int: np.int64, float: np.float64}
+_numpy_types = (np.bool_, np.integer, np.floating)
+
+
+def _to_array(values: list, value_type):
+    '''Returns values as an array that reads back exactly as the values, or None (e.g. ints out of int64 range)'''
+
+    if value_type in _python_dtypes:
+        dtype = _python_dtypes[value_type]
+    elif issubclass(value_type, _numpy_types):
+        dtype = value_type
+    else:
+        return None
+
+    try:
+        return np.array(values, dtype=dtype)
+    except OverflowError:
+        return None
+
+
+def _decode_packets(schema: dict, payload: memoryview) -> list:
+
+    num_rows = schema['num_rows']
+    packets = [dict() for _ in range(num_rows)]
+
+    for column in _iter_columns(schema, payload):
+
+        name, kind = column[:2]
+        rows, values = _decode_column(num_rows, *column[1:])
+        if rows is None:
+            rows = range(num_rows)
+
+        if kind == 'scalar':
+            values = values.tolist()
+        elif kind == 'tuple':
+            values = [tuple(row) for row in values.tolist()]
+        elif kind == 'np_scalar':
+            values = list(values)
+        elif kind == 'np_tuple':
+            values = [tuple(row) for row in values]
+
+        for row, val in zip(rows, values):
+            packets[row][name] = val
+
+    return packets
+
+
+def _iter_columns(schema: dict, payload: memoryview):
+    '''Yields (name, kind, dtype_str, shape, mask, data) of every column'''
+
+    pos = 0
+    for name, kind, dtype_str, shape, mask_len, data_len in schema['columns']:
+        mask = payload[pos:pos + mask_len]
+        pos += mask_len
+        data = payload[pos:pos + data_len]
+        pos += data_len
+        yield name, kind, dtype_str, shape, mask, data
+
+
+def _decode_column(num_rows, kind, dtype_str, shape, mask, data) -> tuple:
+
+    if len(mask) > 0:
+        present = np.unpackbits(np.frombuffer(mask, dtype=np.uint8))[:num_rows].astype(bool)
+        rows = np.flatnonzero(present).tolist()
+        num_values = len(rows)
+    else:
+        rows = None
+        num_values = num_rows
+
+    if kind == 'object':
+        values = pickle.loads(zlib.decompress(data))
+    else:
+        values = np.frombuffer(data, dtype=np.dtype(dtype_str)).reshape((num_values,) + tuple(shape))
+
+    return rows, values
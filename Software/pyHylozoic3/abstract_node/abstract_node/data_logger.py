@@ -12,6 +12,7 @@ from time import perf_counter, sleep, process_time
 import shelve
 from dbm import error as dbm_error
 from .data_save_process import DataSaver
+from .column_store import ColumnStore
 
 
 class DataLogger(threading.Thread):
@@ -42,6 +43,9 @@ class DataLogger(threading.Thread):
     session_datetime0_key = "session_datetime0"
     session_clock0_key = "session_clock0"
 
+    # directory of the column store in a session's directory
+    column_store_dir = "columns"
+
     def __init__(self, log_dir='log_data', log_header='generic_data',
                  log_timestamp=None, log_path=None,
                  **kwarg):
@@ -125,26 +129,33 @@ class DataLogger(threading.Thread):
         # close the session's shelf
         session_shelf.close()
 
-        # queue for packet to come in
-        self.__packet_queue = Queue()
-
-        # queue for static info to come in
-        self.__info_queue = Queue()
+        # queue for packets and static info to come in --- (is_info, node_name, data), or None to terminate
+        self.__queue = Queue()
 
         # data buffer in memory
         self.__data_buffer = defaultdict(list)
+        self.__num_buffered_packets = 0
 
         # variables
         self.__program_terminating = False
 
+        # the data packets are saved to a column store ('columnar') or to the session's shelf ('shelve');
+        # the info is always saved to the shelf
+        if kwarg.get('storage', 'columnar') == 'columnar':
+            column_store_path = os.path.join(self.session_dir_path, self.column_store_dir)
+        else:
+            column_store_path = None
+
         # data saver process
-        self.data_saver = DataSaver(shelve_path=session_path)
+        self.data_saver = DataSaver(shelve_path=session_path, column_store_path=column_store_path,
+                                    time_key=self.packet_time_key)
         self.data_saver.start()
 
         # UDP communication
         # self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
         # parameters
+        # (sleep_time is no longer used since the logger waits on its queue; it's kept for the existing callers)
         if 'sleep_time' in kwarg and isinstance(kwarg['sleep_time'], (float, int)):
             self.sleep_time = float(max(0.0, kwarg['sleep_time']))
         else:
@@ -155,6 +166,12 @@ class DataLogger(threading.Thread):
         else:
             self.save_freq = 2.0
 
+        # the buffered packets are also saved once there are this many of them
+        if 'max_buffered_packets' in kwarg and isinstance(kwarg['max_buffered_packets'], int):
+            self.max_buffered_packets = max(1, kwarg['max_buffered_packets'])
+        else:
+            self.max_buffered_packets = 10000
+
         if 'mode' in kwarg and isinstance(kwarg['mode'], (float, int)):
             self.mode = str(kwarg['mode'])
         else:
@@ -165,84 +182,49 @@ class DataLogger(threading.Thread):
     def run(self):
 
         last_saved_time = perf_counter()
-        mass_cleaning = False
-        packet_queue_all_clr = False
-        info_queue_all_clr = False
-        while (not packet_queue_all_clr) or (not info_queue_all_clr):
+        terminating = False
+        while not terminating:
 
-            # saving run-time data to memory
-            try:
-                # get packet from queue
-                node_name, packet_data = self.__packet_queue.get_nowait()
-            except Empty:
-                if self.__program_terminating:
-                    packet_queue_all_clr = True
+            # wait for the next item, but no longer than when the buffered packets are due to be saved
+            if self.__num_buffered_packets > 0:
+                timeout = max(0.0, last_saved_time + self.save_freq - perf_counter())
             else:
-                # check if the packet has timestamp
-                try:
-                    packet_time = packet_data[self.packet_time_key]
-                    if not isinstance(packet_time, float):
-                        raise TypeError()
-                except (KeyError, TypeError):
-                    packet_time = perf_counter()
-                    packet_data[self.packet_time_key] = packet_time
-
-                # check if the packet has type
-                try:
-                    packet_type = packet_data[self.packet_type_key]
-                    if not isinstance(packet_type, str):
-                        raise TypeError()
-                except (KeyError, TypeError):
-                    packet_type = self.packet_default_type
-                    packet_data[self.packet_type_key] = packet_type
-
+                timeout = None
 
-                # save the packet data in the buffer
-                self.__data_buffer[self.encode_struct(node_name, packet_type)].append(packet_data)
-                # sock_msg = "[%s] <%s>" % (self.encode_struct(node_name, packet_type), str(packet_data))
-                # self.sock.sendto(sock_msg.encode(), (self.UDP_IP, self.UDP_PORT))
-
-            # overwriting persistence info to disk
             try:
-                node_name, info_data = self.__info_queue.get_nowait()
-
+                items = [self.__queue.get(timeout=timeout)]
             except Empty:
-                if self.__program_terminating:
-                    info_queue_all_clr = True
+                items = []
 
-            else:
+            # then take everything else that is in the queue
+            while True:
                 try:
-                    info_type = info_data[self.info_type_key]
-                    if not isinstance(info_type, str):
-                        raise TypeError()
-                except (KeyError, TypeError):
-                    info_type = self.info_default_type
-                # save the info to disk
-                self.data_saver.enqueue_data_block((self.encode_struct(node_name, info_type),
-                                                    info_data))
-                # self.session_shelf[self.encode_struct(node_name, info_type)] = info_data
-
-            # periodic mass clean up
-            if not mass_cleaning and (self.__packet_queue.qsize() > 2000 or self.__info_queue.qsize() > 20):
-                mass_cleaning = True
-                # print('mass_cleaning')
-            # end mass cleaning when both queues are clean
-            elif mass_cleaning and self.__info_queue.empty() and self.__packet_queue.empty():
-                # print('mass_cleaning_done')
-                mass_cleaning = False
-
-            # save data blocks to disk periodically
-            if perf_counter() - last_saved_time > self.save_freq and not self.__program_terminating:
-                self.__save_to_shelf()
-                last_saved_time = perf_counter()
+                    items.append(self.__queue.get_nowait())
+                except Empty:
+                    break
 
-            # don't sleep if program is terminating
-            if self.__program_terminating:
+            for item in items:
+                if item is None:
+                    # the items put before end_data_collection are all in this batch
+                    terminating = True
+                    continue
+
+                is_info, node_name, data = item
+                if is_info:
+                    self.__save_info(node_name, data)
+                else:
+                    self.__buffer_packet(node_name, data)
+
+            # save data blocks to disk periodically, or when the buffer is full
+            if terminating:
                 pass
-            elif mass_cleaning:
-                sleep(0.00001)
-            else:
-                sleep(self.sleep_time)
+            elif perf_counter() - last_saved_time >= self.save_freq or \
+                    self.__num_buffered_packets >= self.max_buffered_packets:
+                self.__save_to_shelf()
+                last_saved_time = perf_counter()
+            # nothing has been buffered since the last save
+            elif self.__num_buffered_packets == 0:
+                last_saved_time = perf_counter()
 
         # save all remaining data in buffer to disk
         self.__save_to_shelf()
@@ -254,14 +236,54 @@ class DataLogger(threading.Thread):
 
         print("Data Logger saved all data to disk.")
 
+    def __buffer_packet(self, node_name, packet_data):
+
+        # check if the packet has timestamp
+        try:
+            packet_time = packet_data[self.packet_time_key]
+            if not isinstance(packet_time, float):
+                raise TypeError()
+        except (KeyError, TypeError):
+            packet_time = perf_counter()
+            packet_data[self.packet_time_key] = packet_time
+
+        # check if the packet has type
+        try:
+            packet_type = packet_data[self.packet_type_key]
+            if not isinstance(packet_type, str):
+                raise TypeError()
+        except (KeyError, TypeError):
+            packet_type = self.packet_default_type
+            packet_data[self.packet_type_key] = packet_type
+
+        # save the packet data in the buffer
+        self.__data_buffer[self.encode_struct(node_name, packet_type)].append(packet_data)
+        self.__num_buffered_packets += 1
+        # sock_msg = "[%s] <%s>" % (self.encode_struct(node_name, packet_type), str(packet_data))
+        # self.sock.sendto(sock_msg.encode(), (self.UDP_IP, self.UDP_PORT))
+
+    def __save_info(self, node_name, info_data):
+
+        # overwriting persistence info to disk
+        try:
+            info_type = info_data[self.info_type_key]
+            if not isinstance(info_type, str):
+                raise TypeError()
+        except (KeyError, TypeError):
+            info_type = self.info_default_type
+        # save the info to disk
+        self.data_saver.enqueue_data_block((self.encode_struct(node_name, info_type), info_data))
+        # self.session_shelf[self.encode_struct(node_name, info_type)] = info_data
+
     def append_data_packet(self, node_name, data_packet):
-        self.__packet_queue.put((node_name, copy(data_packet)))
+        self.__queue.put((False, node_name, copy(data_packet)))
 
     def write_info(self, node_name, info_data):
-        self.__info_queue.put((node_name, deepcopy(info_data)))
+        self.__queue.put((True, node_name, deepcopy(info_data)))
 
     def end_data_collection(self):
         self.__program_terminating = True
+        self.__queue.put(None)
 
     def get_packet(self, session_id: int=0, *struct_labels):
 
@@ -290,7 +312,20 @@ class DataLogger(threading.Thread):
         session_path = os.path.join(os.path.dirname(self.log_path), session_dir, session_dir)
         session_shelf = shelve.open(session_path, flag='r', protocol=3, writeback=False)
 
-        return session_shelf[self.encode_struct(*struct_labels)]
+        packet_key = self.encode_struct(*struct_labels)
+        try:
+            return session_shelf[packet_key]
+        except KeyError:
+            column_store_path = os.path.join(os.path.dirname(self.log_path), session_dir, self.column_store_dir)
+            if not ColumnStore.exists(column_store_path):
+                raise
+            column_store = ColumnStore(column_store_path, flag='r')
+            try:
+                return column_store[packet_key]
+            finally:
+                column_store.close()
+        finally:
+            session_shelf.close()
 
     def __save_to_shelf(self):
         for data_block_key, data_block in self.__data_buffer.items():
@@ -303,9 +338,10 @@ class DataLogger(threading.Thread):
                 # save to the shelf
                 # self.session_shelf[self.encode_struct(data_block_key, block_time_str)] = data_block
                 self.data_saver.enqueue_data_block((self.encode_struct(data_block_key, block_time_str),
-                                                    data_block))
+                                                    data_block), is_packet_block=True)
         # clear data_buffer
         self.__data_buffer = defaultdict(list)
+        self.__num_buffered_packets = 0
 
     def __clock2datetime(self, clock_t: float):
         return self.datetime0 + timedelta(0, clock_t - self.clock0)
@@ -314,6 +350,49 @@ class DataLogger(threading.Thread):
     # return an dictionary from the files for plotting purposes
     def retrieve_data(cls, log_dir: str, log_header=None, log_timestamp=None, log_name=None):
 
+        log_path = cls.find_log_path(log_dir, log_header=log_header, log_timestamp=log_timestamp, log_name=log_name)
+
+        # open the log's index
+        log_index_name = os.path.split(log_path)[-1]
+        log_index_path = os.path.join(log_path, log_index_name)
+        log_index_file = shelve.open(log_index_path, flag='r', protocol=3, writeback=False)
+
+        # create an array of dictionary for each session
+        num_session = int(log_index_file[cls.idx_num_session_key])
+        log_sessions = []
+        for session_id in range(1, num_session+1):
+            session_shelf_key = log_index_file[str(session_id)]
+            session_shelf_path = os.path.join(log_path, session_shelf_key, session_shelf_key)
+
+            try:
+                session_shelf = shelve.open(session_shelf_path, flag='r', protocol=3, writeback=False)
+            except dbm_error:
+                break
+            else:
+                data_dict = dict()
+                for data_key, packet_blocks in session_shelf.items():
+                    data_struct = cls.decode_struct(data_key)
+                    cls.__insert_to_struct(data_dict, data_struct, packet_blocks)
+                session_shelf.close()
+
+                # the data packets of sessions saved to a column store
+                column_store_path = os.path.join(log_path, session_shelf_key, cls.column_store_dir)
+                if ColumnStore.exists(column_store_path):
+                    column_store = ColumnStore(column_store_path, flag='r')
+                    for data_key, packet_blocks in column_store.items():
+                        data_struct = cls.decode_struct(data_key)
+                        cls.__insert_to_struct(data_dict, data_struct, packet_blocks)
+                    column_store.close()
+
+                log_sessions.append(data_dict)
+
+        log_index_file.close()
+
+        return log_sessions, log_index_name
+
+    @classmethod
+    def find_log_path(cls, log_dir: str, log_header=None, log_timestamp=None, log_name=None) -> str:
+
         # check if the log's directory exists
         if isinstance(log_dir, str) and os.path.isdir(log_dir):
             log_dir_path = log_dir
@@ -351,34 +430,7 @@ class DataLogger(threading.Thread):
             else:
                 raise FileNotFoundError('Cannot find any relevant log files in %s' % log_dir_path)
 
-        # open the log's index
-        log_index_name = os.path.split(log_path)[-1]
-        log_index_path = os.path.join(log_path, log_index_name)
-        log_index_file = shelve.open(log_index_path, flag='r', protocol=3, writeback=False)
-
-        # create an array of dictionary for each session
-        num_session = int(log_index_file[cls.idx_num_session_key])
-        log_sessions = []
-        for session_id in range(1, num_session+1):
-            session_shelf_key = log_index_file[str(session_id)]
-            session_shelf_path = os.path.join(log_path, session_shelf_key, session_shelf_key)
-
-            try:
-                session_shelf = shelve.open(session_shelf_path, flag='r', protocol=3, writeback=False)
-            except dbm_error:
-                break
-            else:
-                data_dict = dict()
-                for data_key, packet_blocks in session_shelf.items():
-                    data_struct = cls.decode_struct(data_key)
-                    cls.__insert_to_struct(data_dict, data_struct, packet_blocks)
-
-                log_sessions.append(data_dict)
-                session_shelf.close()
-
-        log_index_file.close()
-
-        return log_sessions, log_index_name
+        return log_path
 
     @classmethod
     def __insert_to_struct(cls, data_dict, structure, value):
@@ -6,12 +6,21 @@ from time import sleep, perf_counter
 import logging
 import sys
 
+from .column_store import ColumnStore
+
 
 class DataSaver(Process):
 
-    def __init__(self, shelve_path):
+    def __init__(self, shelve_path, column_store_path=None, time_key=None):
 
         self.shelf = shelve.open(shelve_path, protocol=3, writeback=False)
+
+        # blocks of data packets go to the column store if there is one
+        if column_store_path is not None:
+            self.column_store = ColumnStore(column_store_path, time_key=time_key)
+        else:
+            self.column_store = None
+
         self.__data_queue = Queue()
         self.__program_terminating = Event()
         super(DataSaver, self).__init__(name="DataSaver")
@@ -23,22 +32,27 @@ class DataSaver(Process):
         while not exit_process:
 
             try:
-                block_key, block_data = self.__data_queue.get(block=True, timeout=2)
+                (block_key, block_data), is_packet_block = self.__data_queue.get(block=True, timeout=2)
             except queues.Empty:
                 if self.__program_terminating.is_set():
                     exit_process = True
             else:
-                self.shelf[block_key] = block_data
+                if is_packet_block and self.column_store is not None:
+                    self.column_store[block_key] = block_data
+                else:
+                    self.shelf[block_key] = block_data
 
             sleep(0.0001)
 
         self.shelf.close()
+        if self.column_store is not None:
+            self.column_store.close()
 
-    def enqueue_data_block(self, data_block: tuple):
+    def enqueue_data_block(self, data_block: tuple, is_packet_block=False):
         if not isinstance(data_block, tuple) and len(data_block) == 2:
             raise TypeError("Data block must be a tuple of length 2!")
 
-        self.__data_queue.put(data_block)
+        self.__data_queue.put((data_block, is_packet_block))
 
     def terminate_program(self):
 
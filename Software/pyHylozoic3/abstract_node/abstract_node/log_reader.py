@@ -0,0 +1,293 @@
+__author__ = 'Matthew'
+
+import os
+import shelve
+
+import numpy as np
+
+from .data_logger import DataLogger
+from .column_store import ColumnStore
+
+
+class LogReader(object):
+
+    """
+    Lazy reader of a log saved by DataLogger, for exploring logs that are too large to load with retrieve_data.
+
+        log = LogReader('cbla_log', log_header='cbla_triplet')
+        t, M = log.node('c1.cbla_light_0').field('M', t0=3600, t1=7200)
+
+    - Nothing is read until it is asked for. Sessions are opened when they are first used,
+      and a field is only read from the blocks whose time range overlaps [t0, t1].
+    - Times are in seconds since the start of the session, like in DataPlotter.
+    - Column stores are memory-mapped, so only the pages of the requested columns are read from the disk.
+      Sessions saved to a shelf (storage='shelve') can be read too, but their blocks are decoded whole.
+    - session_id is the session number (from 1), or counts back from the latest session if <= 0, like in get_packet.
+    """
+
+    def __init__(self, log_dir, log_header=None, log_timestamp=None, log_name=None):
+
+        self.log_path = DataLogger.find_log_path(log_dir, log_header=log_header,
+                                                 log_timestamp=log_timestamp, log_name=log_name)
+        self.log_name = os.path.split(self.log_path)[-1]
+
+        log_index_file = shelve.open(os.path.join(self.log_path, self.log_name), flag='r', protocol=3, writeback=False)
+        num_session = int(log_index_file[DataLogger.idx_num_session_key])
+        self.session_dirs = [log_index_file[str(session_id)] for session_id in range(1, num_session + 1)]
+        log_index_file.close()
+
+        # session id --> SessionReader
+        self.__sessions = dict()
+
+    @property
+    def num_session(self) -> int:
+        return len(self.session_dirs)
+
+    def session(self, session_id=0):
+
+        if session_id <= 0:
+            session_id += self.num_session
+        if not 1 <= session_id <= self.num_session:
+            raise ValueError('session_id must be in [%d, %d]' % (1 - self.num_session, self.num_session))
+
+        if session_id not in self.__sessions:
+            session_dir_path = os.path.join(self.log_path, self.session_dirs[session_id - 1])
+            self.__sessions[session_id] = SessionReader(session_dir_path)
+
+        return self.__sessions[session_id]
+
+    def node(self, node_name, packet_type=DataLogger.packet_default_type, session_id=0):
+        return self.session(session_id).node(node_name, packet_type=packet_type)
+
+    def close(self):
+
+        for session in self.__sessions.values():
+            session.close()
+        self.__sessions = dict()
+
+
+class SessionReader(object):
+
+    """Lazy reader of one session of a log. The packets are read from its column store or from its shelf."""
+
+    def __init__(self, session_dir_path):
+
+        self.session_dir_path = session_dir_path
+        session_name = os.path.split(session_dir_path)[-1]
+
+        self.shelf = shelve.open(os.path.join(session_dir_path, session_name), flag='r', protocol=3, writeback=False)
+        self.clock0 = self.shelf[DataLogger.session_clock0_key]
+        self.datetime0 = self.shelf[DataLogger.session_datetime0_key]
+
+        column_store_path = os.path.join(session_dir_path, DataLogger.column_store_dir)
+        if ColumnStore.exists(column_store_path):
+            self.column_store = ColumnStore(column_store_path, flag='r')
+        else:
+            self.column_store = None
+
+        # keys of the blocks and the info, from both the column store and the shelf
+        self.keys = set(key for key in self.shelf.keys() if len(DataLogger.decode_struct(key)) > 1)
+        if self.column_store is not None:
+            self.keys.update(self.column_store.keys())
+
+    def node_names(self) -> list:
+        return sorted(set(DataLogger.decode_struct(key)[0] for key in self.keys))
+
+    def node(self, node_name, packet_type=DataLogger.packet_default_type):
+        return NodeView(self, node_name, packet_type)
+
+    def info(self, node_name, info_type=DataLogger.info_default_type):
+        return self.shelf[DataLogger.encode_struct(node_name, info_type)]
+
+    def block_keys(self, node_name, packet_type) -> list:
+
+        # the block keys end with the time of their first packet, so they sort in time
+        prefix = DataLogger.encode_struct(node_name, packet_type, '')
+        return sorted(key for key in self.keys if key.startswith(prefix))
+
+    def get_block(self, block_key) -> list:
+
+        if self.column_store is not None and block_key in self.column_store:
+            return self.column_store[block_key]
+        return self.shelf[block_key]
+
+    def get_time_range(self, block_key):
+        '''Returns the time range of the block since the start of the session (None if it is not indexed)'''
+
+        if self.column_store is None or block_key not in self.column_store:
+            return None
+
+        time_range = self.column_store.get_time_range(block_key)
+        if time_range is None:
+            return None
+        return time_range[0] - self.clock0, time_range[1] - self.clock0
+
+    def read_column(self, block_key, name) -> tuple:
+        '''Returns the times and the values of a field in a block --- (t, values); (None, None) if it has no such field'''
+
+        time_key = DataLogger.packet_time_key
+
+        if self.column_store is not None and block_key in self.column_store:
+            try:
+                rows, values = self.column_store.get_column(block_key, name)
+            except KeyError:
+                return None, None
+            t = self.column_store.get_column(block_key, time_key)[1]
+            if rows is not None:
+                t = t[rows]
+            return t - self.clock0, values
+
+        packets = [packet for packet in self.shelf[block_key] if name in packet]
+        if not packets:
+            return None, None
+        t = np.array([packet[time_key] for packet in packets], dtype=float)
+        values = _to_array([packet[name] for packet in packets])
+        return t - self.clock0, values
+
+    def close(self):
+
+        self.shelf.close()
+        if self.column_store is not None:
+            self.column_store.close()
+
+
+class NodeView(object):
+
+    """View of the packets of one type of a node in a session. Each call reads only the blocks it needs."""
+
+    def __init__(self, session: SessionReader, node_name, packet_type=DataLogger.packet_default_type):
+
+        self.session = session
+        self.node_name = node_name
+        self.packet_type = packet_type
+        self.block_keys = session.block_keys(node_name, packet_type)
+
+    def time_range(self):
+        '''Returns the time range of the packets since the start of the session (None if there is none)'''
+
+        t_min = t_max = None
+        for block_key in self.block_keys:
+            block_range = self.session.get_time_range(block_key)
+            if block_range is None:
+                t = self.session.read_column(block_key, DataLogger.packet_time_key)[0]
+                if t is None or len(t) == 0:
+                    continue
+                block_range = (t.min(), t.max())
+            t_min = block_range[0] if t_min is None else min(t_min, block_range[0])
+            t_max = block_range[1] if t_max is None else max(t_max, block_range[1])
+
+        if t_min is None:
+            return None
+        return float(t_min), float(t_max)
+
+    def fields(self) -> list:
+
+        names = []
+        for block_key in self.block_keys:
+            if self.session.column_store is not None and block_key in self.session.column_store:
+                block_names = [column[0] for column in self.session.column_store.get_schema(block_key)['columns']]
+            else:
+                block_names = [name for packet in self.session.get_block(block_key) for name in packet]
+            for name in block_names:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def field(self, name, t0=None, t1=None) -> tuple:
+        '''
+        Returns the times and the values of a field in [t0, t1], in time order --- (t, values).
+        The values are an array if they are numbers, bools or tuples of numbers (one row per packet), and a list otherwise.
+        '''
+
+        t_parts = []
+        value_parts = []
+        for block_key in self.__get_block_keys(t0, t1):
+
+            t, values = self.session.read_column(block_key, name)
+            if t is None:
+                continue
+
+            selected = _select(t, t0, t1)
+            t_parts.append(t[selected])
+            if isinstance(values, np.ndarray):
+                value_parts.append(values[selected])
+            else:
+                value_parts.append([val for val, is_selected in zip(values, selected) if is_selected])
+
+        if not t_parts:
+            return np.zeros(0), np.zeros(0)
+
+        t = np.concatenate(t_parts)
+        values = _join(value_parts)
+
+        # blocks (and the packets in them) are almost always in time order already
+        if np.any(np.diff(t) < 0):
+            order = np.argsort(t, kind='mergesort')
+            t = t[order]
+            if isinstance(values, np.ndarray):
+                values = values[order]
+            else:
+                values = [values[i] for i in order]
+
+        return t, values
+
+    def packets(self, t0=None, t1=None):
+        '''Yields the packets in [t0, t1], block by block'''
+
+        for block_key in self.__get_block_keys(t0, t1):
+            for packet in self.session.get_block(block_key):
+                t = packet[DataLogger.packet_time_key] - self.session.clock0
+                if (t0 is None or t >= t0) and (t1 is None or t <= t1):
+                    yield packet
+
+    def __get_block_keys(self, t0, t1) -> list:
+
+        block_keys = []
+        for block_key in self.block_keys:
+            block_range = self.session.get_time_range(block_key)
+            if block_range is not None:
+                if t1 is not None and block_range[0] > t1:
+                    continue
+                if t0 is not None and block_range[1] < t0:
+                    continue
+            block_keys.append(block_key)
+        return block_keys
+
+
+def _select(t: np.ndarray, t0, t1) -> np.ndarray:
+
+    selected = np.ones(len(t), dtype=bool)
+    if t0 is not None:
+        selected &= t >= t0
+    if t1 is not None:
+        selected &= t <= t1
+    return selected
+
+
+def _to_array(values: list):
+
+    # numbers, bools and tuples of numbers as an array, everything else as a list
+    try:
+        array = np.asarray(values)
+    except ValueError:
+        return values
+    if array.dtype.kind in 'biuf':
+        return array
+    return values
+
+
+def _join(parts: list):
+
+    if all(isinstance(part, np.ndarray) for part in parts) and len(set(part.shape[1:] for part in parts)) == 1:
+        return np.concatenate(parts)
+
+    values = []
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            if part.ndim > 1:
+                values += [tuple(row) for row in part.tolist()]
+            else:
+                values += part.tolist()
+        else:
+            values += part
+    return values
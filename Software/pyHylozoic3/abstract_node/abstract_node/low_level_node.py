@@ -48,31 +48,27 @@ class Fin(Node):
 
         self.print_to_term = False
 
-    def run(self):
-
-        while self.alive:
+    def step(self):
 
-            if self.in_var['motion_type'].val == Fin.ON_LEFT:
+        if self.in_var['motion_type'].val == Fin.ON_LEFT:
 
-                T_left_ref = Fin.T_ON_REF
-                T_right_ref = 0
+            T_left_ref = Fin.T_ON_REF
+            T_right_ref = 0
 
-            elif self.in_var['motion_type'].val == Fin.ON_RIGHT:
-                T_left_ref = 0
-                T_right_ref = Fin.T_ON_REF
+        elif self.in_var['motion_type'].val == Fin.ON_RIGHT:
+            T_left_ref = 0
+            T_right_ref = Fin.T_ON_REF
 
-            elif self.in_var['motion_type'].val == Fin.ON_CENTRE:
-                T_left_ref = Fin.T_ON_REF
-                T_right_ref = Fin.T_ON_REF
-
-            else:
-                T_left_ref = 0
-                T_right_ref = 0
+        elif self.in_var['motion_type'].val == Fin.ON_CENTRE:
+            T_left_ref = Fin.T_ON_REF
+            T_right_ref = Fin.T_ON_REF
 
-            self.ctrl_left.update(T_left_ref)
-            self.ctrl_right.update(T_right_ref)
+        else:
+            T_left_ref = 0
+            T_right_ref = 0
 
-            sleep(self.messenger.estimated_msg_period*2)
+        self.ctrl_left.update(T_left_ref)
+        self.ctrl_right.update(T_right_ref)
 
 
 class SMA_Controller(object):
@@ -122,46 +118,47 @@ class Half_Fin(Simple_Node):
 
         self.k = 52.59
 
-    def run(self):
+    def step(self):
 
-        while self.alive:
-            if (self.in_var['temp_ref'].val >= 1):
-                linear_ref = np.log(self.in_var['temp_ref'].val)*self.k
-            else:
-                linear_ref = self.in_var['temp_ref'].val
+        if (self.in_var['temp_ref'].val >= 1):
+            linear_ref = np.log(self.in_var['temp_ref'].val)*self.k
+        else:
+            linear_ref = self.in_var['temp_ref'].val
 
-            self.controller.update(linear_ref)
-            sleep(self.messenger.estimated_msg_period*2)
+        self.controller.update(linear_ref)
 
 
-class LED_Driver(Simple_Node):
+class LED_Driver(Event_Driven_Node):
 
     def __init__(self, messenger: Messenger, node_name='LED_Driver',
                  led_ref: Var=Var(0), led_out: Var=Var(0), step_period=0, incre_k=0.1):
 
-        super(LED_Driver, self).__init__(messenger, node_name='%s' % node_name, output=led_out,
-                                         led_ref=led_ref)
+        super(LED_Driver, self).__init__(messenger, node_name='%s' % node_name)
+
+        self.out_var['output'] = led_out
+        self.in_var['led_ref'] = led_ref
 
         self.step_period = step_period
         self.incre_k = incre_k
 
-    def run(self):
+        self.print_to_term = False
 
-        while self.alive:
+    def update(self):
 
-            if self.out_var['output'].val < self.in_var['led_ref'].val:
-                led_out = self.out_var['output'].val + max(1, int(self.out_var['output'].val * self.incre_k))
-                self.out_var['output'].val = max(0, min(255, led_out))
-                sleeping_time = max(0, max(self.messenger.estimated_msg_period * 2, self.step_period))
+        if self.out_var['output'].val < self.in_var['led_ref'].val:
+            led_out = self.out_var['output'].val + max(1, int(self.out_var['output'].val * self.incre_k))
+            self.out_var['output'].val = max(0, min(255, led_out))
 
-            elif self.out_var['output'].val > self.in_var['led_ref'].val:
-                led_out = self.out_var['output'].val - max(1, int(self.out_var['output'].val * self.incre_k))
-                self.out_var['output'].val = max(0, min(255, led_out))
-                sleeping_time = max(0, max(self.messenger.estimated_msg_period * 2, self.step_period))
-            else:
-                sleeping_time = max(0,self.messenger.estimated_msg_period * 2)
+        elif self.out_var['output'].val > self.in_var['led_ref'].val:
+            led_out = self.out_var['output'].val - max(1, int(self.out_var['output'].val * self.incre_k))
+            self.out_var['output'].val = max(0, min(255, led_out))
 
-            sleep(sleeping_time)
+        # keep stepping until the output reaches the reference; then wait for the reference to change
+        if self.out_var['output'].val != self.in_var['led_ref'].val:
+            self.input_changed_event.set()
+
+    def update_period(self):
+        return max(0, max(self.messenger.estimated_msg_period * 2, self.step_period))
 
 
 
@@ -254,18 +251,18 @@ class Pseudo_Differentiation(Node):
         self.input_deque = deque(maxlen=(self.smoothing+self.diff_gap))
         self.step_period = step_period
 
-    def run(self):
+    def step(self):
 
-        while self.alive:
+        self.input_deque.append(copy(self.in_var['input'].val))
 
-            self.input_deque.append(copy(self.in_var['input'].val))
+        # calculate differences
+        val_list = list(self.input_deque)
+        if len(val_list) >= self.diff_gap + 1:
+            self.out_var['output'].val = np.mean(val_list[-self.smoothing:]) \
+                                         - np.mean(val_list[:-self.diff_gap])
 
-            # calculate differences
-            val_list = list(self.input_deque)
-            if len(val_list) >= self.diff_gap + 1:
-                self.out_var['output'].val = np.mean(val_list[-self.smoothing:]) \
-                                             - np.mean(val_list[:-self.diff_gap])
-            sleep(self.step_period)
+    def get_step_period(self):
+        return self.step_period
 
 
 class Running_Average(Node):
@@ -289,14 +286,14 @@ class Running_Average(Node):
         self.input_deque = deque(maxlen=avg_window)
         self.step_period = step_period
 
-    def run(self):
-        while self.alive:
+    def step(self):
 
-            self.input_deque.append(copy(self.in_var['input'].val))
+        self.input_deque.append(copy(self.in_var['input'].val))
 
-            self.out_var['output'].val = np.mean(self.input_deque)
+        self.out_var['output'].val = np.mean(self.input_deque)
 
-            sleep(self.step_period)
+    def get_step_period(self):
+        return self.step_period
 
 
 
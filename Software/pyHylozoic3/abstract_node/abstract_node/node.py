@@ -6,7 +6,8 @@ import threading
 
 from interactive_system import Messenger
 from interactive_system import command_object
-from time import sleep
+from interactive_system import InputStateTable
+from time import sleep, perf_counter
 from collections import OrderedDict
 
 
@@ -16,6 +17,7 @@ class Var(object):
     
     This provides a standard interface for all variables within the system. 
     This allows all variables, including those of immutable types, to be passed by refernce through this mutable object.
+    Callbacks can subscribe to a variable to be notified when its value changes.
     
     Parameters
     ------------
@@ -28,6 +30,9 @@ class Var(object):
     
     __val
         Value of the variable
+
+    __subscribers
+        Callbacks that are called with the variable when its value changes
         
     Examples
     ------------
@@ -39,6 +44,7 @@ class Var(object):
 
     def __init__(self, val=0):
         self.__val = val
+        self.__subscribers = []
 
     @property
     def val(self):
@@ -46,7 +52,37 @@ class Var(object):
 
     @val.setter
     def val(self, new_val):
-        self.__val = new_val
+
+        # only compare the values if anyone is listening
+        if self.__subscribers:
+            try:
+                changed = bool(new_val != self.__val)
+            except (TypeError, ValueError):
+                # e.g. arrays, which have no single truth value
+                changed = True
+
+            self.__val = new_val
+            if changed:
+                for callback in tuple(self.__subscribers):
+                    callback(self)
+        else:
+            self.__val = new_val
+
+    def subscribe(self, callback):
+        if callback not in self.__subscribers:
+            self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        try:
+            self.__subscribers.remove(callback)
+        except ValueError:
+            pass
+
+    def __getstate__(self):
+        # subscribers are local to the running system; they are not copied or pickled
+        state = self.__dict__.copy()
+        state['_Var__subscribers'] = []
+        return state
 
 
 class Node(threading.Thread):
@@ -55,6 +91,8 @@ class Node(threading.Thread):
     This provides a standard structure that represents each independent abstract component in the system.
     Each Node is a thread. This allows Nodes in the system to run asynchronously.
     Each Node has a set of input and output variables of type Var. A Node interacts with other Nodes by means of having common variables.
+    A Node either defines run, or defines step, which does one iteration of its loop. A Node that defines step can be
+    run in its own thread or by a NodeScheduler, which runs many Nodes on a small pool of threads.
     
     Parameters
     -----------
@@ -89,6 +127,10 @@ class Node(threading.Thread):
         self.update_freq = 2
         self.alive = True
 
+        # measured time between two steps (exponential moving average)
+        self.actual_step_period = None
+        self.__last_step_time = None
+
     @property
     def in_var_list(self) -> tuple:
         return tuple(self.in_var.keys())
@@ -98,7 +140,48 @@ class Node(threading.Thread):
         return tuple(self.out_var.keys())
 
     def run(self):
-        raise SystemError('Run must be defined in the child class')
+
+        if not self.is_steppable:
+            raise SystemError('Run or step must be defined in the child class')
+
+        while self.alive:
+            self.record_step(perf_counter())
+            self.step()
+            sleep(self.get_step_period())
+
+    def step(self):
+        raise SystemError('Step must be defined in the child class')
+
+    @property
+    def is_steppable(self) -> bool:
+
+        # a child class that overrides run with its own loop is not stepped, even if its parent class defines step
+        mro = type(self).__mro__
+        step_cls = next(cls for cls in mro if 'step' in cls.__dict__)
+        run_cls = next(cls for cls in mro if 'run' in cls.__dict__)
+        return step_cls is not Node and issubclass(step_cls, run_cls)
+
+    def get_step_period(self):
+        return self.messenger.estimated_msg_period * self.update_freq
+
+    def record_step(self, step_time):
+
+        if self.__last_step_time is not None:
+            period = step_time - self.__last_step_time
+            if self.actual_step_period is None:
+                self.actual_step_period = period
+            else:
+                self.actual_step_period += 0.1 * (period - self.actual_step_period)
+        self.__last_step_time = step_time
+
+    def report_rate(self):
+        '''Returns the actual and the target step rate (in Hz) of the Node'''
+
+        target_period = self.get_step_period()
+        target_rate = 1.0 / target_period if target_period > 0 else float('inf')
+        if not self.actual_step_period:
+            return None, target_rate
+        return 1.0 / self.actual_step_period, target_rate
 
     def add_in_var(self, var: Var, var_key: str):
 
@@ -144,6 +227,115 @@ class Node(threading.Thread):
         self.messenger.load_message(cmd_obj)
 
 
+class Event_Driven_Node(Node):
+    '''The base class for Nodes that only run when their input variables change
+
+    Instead of looping at a fixed period, the Node waits until the value of any of its input variables changes,
+    and then calls update.
+
+    Parameters
+    -----------
+
+    min_period : float (default = None)
+        The minimum time between two updates. Changes within this time are handled together in the next update.
+        If None, it is the estimated message period of the Messenger times update_freq.
+
+    max_period : float (default = None)
+        The maximum time between two updates, even if none of the inputs changed. If None, it only updates on changes.
+
+    Setting alive to False also wakes the Node up, so that its thread exits even if none of its inputs change.
+
+    '''
+
+    def __init__(self, messenger: Messenger, node_name=None, min_period=None, max_period=None):
+
+        # event is set when any input variable changes; it starts set so that the Node updates once at the start
+        # (it's created first since setting alive uses it)
+        self.input_changed_event = threading.Event()
+        self.input_changed_event.set()
+
+        super(Event_Driven_Node, self).__init__(messenger, node_name=node_name)
+
+        self.min_period = min_period
+        self.max_period = max_period
+
+        self.subscribed = False
+        self.last_update_time = perf_counter()
+
+    @property
+    def alive(self) -> bool:
+        return self.__alive
+
+    @alive.setter
+    def alive(self, alive):
+        self.__alive = alive
+        if not alive:
+            self.input_changed_event.set()
+
+    def run(self):
+
+        self.subscribe_inputs()
+
+        while self.alive:
+
+            self.input_changed_event.wait(timeout=self.get_max_period())
+            self.input_changed_event.clear()
+            if not self.alive:
+                break
+
+            self.record_step(perf_counter())
+            self.update()
+
+            sleep(self.update_period())
+
+        self.unsubscribe_inputs()
+
+    def step(self):
+
+        if not self.subscribed:
+            self.subscribe_inputs()
+
+        if not self.input_changed_event.is_set():
+            max_period = self.get_max_period()
+            if max_period is None or perf_counter() - self.last_update_time < max_period:
+                return
+        self.input_changed_event.clear()
+
+        self.last_update_time = perf_counter()
+        self.update()
+
+        if not self.alive:
+            self.unsubscribe_inputs()
+
+    def get_step_period(self):
+        return self.update_period()
+
+    def get_max_period(self):
+        return self.max_period
+
+    def subscribe_inputs(self):
+        for var in self.in_var.values():
+            var.subscribe(self.notify_input_changed)
+        self.subscribed = True
+
+    def unsubscribe_inputs(self):
+        for var in self.in_var.values():
+            var.unsubscribe(self.notify_input_changed)
+        self.subscribed = False
+
+    def notify_input_changed(self, var=None):
+        self.input_changed_event.set()
+
+    def update_period(self):
+
+        if self.min_period is None:
+            return self.messenger.estimated_msg_period * self.update_freq
+        return self.min_period
+
+    def update(self):
+        raise SystemError('Update must be defined in the child class')
+
+
 class Input_Node(Node):
 
     def __init__(self, messenger: Messenger, teensy_name: str, node_name='input_node', **input_name):
@@ -160,36 +352,56 @@ class Input_Node(Node):
             self.out_var[name] = Var(0)
             self.in_dev[name] = input_dev
 
+        # resolve the indices of the input devices in the input state table of the Teensy once
+        self.input_table = None
+        self.in_idx = dict()
+        try:
+            input_state = messenger.cmd.teensy_manager.get_protocol(teensy_name).input_state
+        except AttributeError:
+            pass
+        else:
+            if isinstance(input_state, InputStateTable):
+                self.input_table = input_state
+                for name, input_dev in self.in_dev.items():
+                    self.in_idx[name] = input_state.get_index(input_dev)
+
         self.print_to_term = False
         self.update_freq = 1.5
 
-    def run(self):
-
-        while self.alive:
+    def step(self):
 
-            if self.teensy_name not in self.messenger.active_teensy_list:
-                self.alive = False
-                print('%s is no longer functional. Terminated.' % self.node_name)
-                return
+        if self.teensy_name not in self.messenger.active_teensy_list:
+            self.alive = False
+            print('%s is no longer functional. Terminated.' % self.node_name)
+            return
 
-            out_var_list = []
+        if self.input_table is not None:
+            input_values = self.input_table.values
+        else:
             sample = self.read_sample()
 
-            for name in self.out_var.keys():
-                out_var_list.append((self.in_dev[name], self.out_var[name]))
+        for name in self.out_var.keys():
 
+            if self.input_table is not None:
+                self.out_var[name].val = input_values[self.in_idx[name]]
+            else:
                 self.out_var[name].val = sample[self.teensy_name][0][self.in_dev[name]]
 
-                if self.print_to_term:
-                    print('[%s] %s: %f' % (self.in_dev[name], 'sensor_out', self.out_var[name].val))
-            sleep(self.messenger.estimated_msg_period * self.update_freq)
+            if self.print_to_term:
+                print('[%s] %s: %f' % (self.in_dev[name], 'sensor_out', self.out_var[name].val))
 
 
-class Output_Node(Node):
+class Output_Node(Event_Driven_Node):
 
-    def __init__(self, messenger: Messenger, teensy_name: str, node_name='output_node', **output_name):
+    # the outputs are sent again after this many message periods without a change,
+    # so that an output is not left wrong after a lost message or a reset of the Teensy
+    refresh_freq = 10
 
-        super(Output_Node, self).__init__(messenger, node_name='%s.%s' % (teensy_name, node_name))
+    def __init__(self, messenger: Messenger, teensy_name: str, node_name='output_node', max_period=None,
+                 **output_name):
+
+        super(Output_Node, self).__init__(messenger, node_name='%s.%s' % (teensy_name, node_name),
+                                          max_period=max_period)
 
         if not isinstance(teensy_name, str):
             raise TypeError('teensy_name must be a string!')
@@ -204,24 +416,28 @@ class Output_Node(Node):
         self.print_to_term = False
         self.update_freq = 2
 
-    def run(self):
+    def get_max_period(self):
 
-        while self.alive:
+        if self.max_period is None:
+            return self.messenger.estimated_msg_period * self.refresh_freq
+        return self.max_period
 
-            if self.teensy_name not in self.messenger.active_teensy_list:
-                self.alive = False
-                print('%s is no longer functional. Terminated.' % self.node_name)
-                return
+    def update(self):
+
+        if self.teensy_name not in self.messenger.active_teensy_list:
+            self.alive = False
+            print('%s is no longer functional. Terminated.' % self.node_name)
+            return
 
-            in_var_list = []
-            for name in self.in_var.keys():
-                in_var_list.append((self.out_dev[name], self.in_var[name]))
+        # send the outputs when their values changed, and once in a while to refresh them
+        in_var_list = []
+        for name in self.in_var.keys():
+            in_var_list.append((self.out_dev[name], self.in_var[name]))
 
-            self.send_output_cmd(self.teensy_name, tuple(in_var_list))
-            for name in self.in_var.keys():
-                if self.print_to_term:
-                    print('[%s] %s: %f' % (self.out_dev[name], 'action_out', self.in_var[name].val))
-            sleep(self.messenger.estimated_msg_period * self.update_freq)
+        self.send_output_cmd(self.teensy_name, tuple(in_var_list))
+        for name in self.in_var.keys():
+            if self.print_to_term:
+                print('[%s] %s: %f' % (self.out_dev[name], 'action_out', self.in_var[name].val))
 
 
 class Simple_Node(Node):
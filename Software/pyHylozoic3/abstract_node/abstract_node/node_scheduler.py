@@ -0,0 +1,173 @@
+'''Scheduler that runs the step functions of many Nodes on a small pool of threads.'''
+
+import threading
+import queue
+import heapq
+from itertools import count
+from time import perf_counter
+from collections import OrderedDict
+
+from abstract_node.node import Node
+
+
+class NodeScheduler(threading.Thread):
+
+    """
+    NodeScheduler runs the step function of each Node at the Node's own period on a fixed number of worker threads.
+
+    - The Nodes waiting for their next step are kept in a priority queue ordered by the time that they are due.
+    - The scheduler thread hands each Node that is due to one of the worker threads.
+    - A Node is never stepped by two workers at the same time. It is scheduled again one period after it was due,
+      or right away if it is already late, so that late Nodes do not step in bursts to catch up.
+    - Nodes that do not define step are started as their own thread instead.
+    """
+
+    def __init__(self, num_workers=4, auto_start=True):
+
+        super(NodeScheduler, self).__init__(name='Node_Scheduler', daemon=True)
+
+        # (due time, sequence number, node); the sequence number keeps Nodes due at the same time in order
+        self.__schedule = []
+        self.__seq = count()
+        self.__schedule_cond = threading.Condition()
+
+        # Nodes that are due and waiting for a worker --- (due time, node)
+        self.ready_q = queue.Queue()
+
+        # node_name --> Node run by the scheduler
+        self.node_list = OrderedDict()
+
+        # Nodes that run in their own thread
+        self.thread_node_list = OrderedDict()
+
+        # notified when a scheduled Node is dropped after it was killed
+        self.__nodes_cond = threading.Condition()
+
+        self.alive = True
+
+        self.workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self.__run_worker, name='Node_Worker_%d' % i, daemon=True)
+            self.workers.append(worker)
+            worker.start()
+
+        if auto_start:
+            self.start()
+
+    def add_node(self, node: Node):
+
+        if not isinstance(node, Node):
+            raise TypeError("node must be of type Node!")
+
+        if not node.is_steppable:
+            self.thread_node_list[node.node_name] = node
+            node.start()
+            return False
+
+        self.node_list[node.node_name] = node
+        self.__schedule_node(node, perf_counter())
+        return True
+
+    def run(self):
+
+        while self.alive:
+
+            with self.__schedule_cond:
+                while self.alive and not self.__schedule:
+                    self.__schedule_cond.wait()
+                if not self.alive:
+                    break
+
+                due_time = self.__schedule[0][0]
+                delay = due_time - perf_counter()
+                if delay > 0:
+                    # a Node may be added that is due before the first one
+                    self.__schedule_cond.wait(timeout=delay)
+                    continue
+
+                due_time, _, node = heapq.heappop(self.__schedule)
+
+            self.ready_q.put((due_time, node))
+
+        # wake up the workers so that they can exit
+        for _ in self.workers:
+            self.ready_q.put(None)
+
+    def __run_worker(self):
+
+        while True:
+            task = self.ready_q.get()
+            if task is None:
+                break
+            due_time, node = task
+
+            if not node.alive:
+                self.__drop_node(node)
+                continue
+
+            step_time = perf_counter()
+            node.record_step(step_time)
+            try:
+                node.step()
+            except Exception as e:
+                # same as the thread of the Node dying
+                print('%s: %s' % (node.node_name, e))
+                node.alive = False
+
+            if not node.alive:
+                self.__drop_node(node)
+                continue
+
+            self.__schedule_node(node, max(due_time + node.get_step_period(), perf_counter()))
+
+    def __drop_node(self, node):
+        with self.__nodes_cond:
+            self.node_list.pop(node.node_name, None)
+            self.__nodes_cond.notify_all()
+
+    def __schedule_node(self, node, due_time):
+        with self.__schedule_cond:
+            heapq.heappush(self.__schedule, (due_time, next(self.__seq), node))
+            self.__schedule_cond.notify()
+
+    def get_rates(self):
+        '''Returns the actual and the target step rate (in Hz) of every Node --- {node_name: (actual, target)}'''
+
+        rates = OrderedDict()
+        for node_name, node in list(self.node_list.items()) + list(self.thread_node_list.items()):
+            rates[node_name] = node.report_rate()
+        return rates
+
+    def join_nodes(self, timeout=None):
+        '''
+        Waits until all the Nodes have stopped: the Nodes with their own thread have exited,
+        and the scheduled Nodes have been killed (they are never started, so they can't be joined)
+        '''
+
+        deadline = None if timeout is None else perf_counter() + timeout
+
+        for node in list(self.thread_node_list.values()):
+            node.join(None if deadline is None else max(0.0, deadline - perf_counter()))
+
+        with self.__nodes_cond:
+            while any(node.alive for node in self.node_list.values()):
+                remaining = None if deadline is None else deadline - perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                # alive can be set to False without notifying, so check again once in a while
+                self.__nodes_cond.wait(0.5 if remaining is None else min(0.5, remaining))
+
+        return not any(node.is_alive() for node in self.thread_node_list.values())
+
+    def stop(self, timeout=None):
+        '''Stops the scheduler; the Nodes must have been killed first'''
+
+        with self.__schedule_cond:
+            self.alive = False
+            self.__schedule_cond.notify()
+        self.join(timeout)
+        for worker in self.workers:
+            worker.join(timeout)
+
+        for node in self.thread_node_list.values():
+            node.join(timeout)
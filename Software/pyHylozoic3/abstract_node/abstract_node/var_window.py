@@ -0,0 +1,154 @@
+'''Time-windowed aggregates of the value of a Var'''
+
+import threading
+import weakref
+from time import perf_counter
+from collections import deque
+
+from abstract_node.node import Var
+
+
+class VarWindow(object):
+    '''Mean and maximum of the value of a Var over the last window_period seconds
+
+    The VarWindow subscribes to the Var, so it is fed by whatever updates the Var (e.g. an Input_Node at the
+    rate of the Messenger) and reading the aggregate never has to wait for new samples.
+    The value is treated as constant between two changes. The mean is weighted by time.
+
+    - The segments of constant value are kept in a deque, along with the running sum of value * duration
+      of all the segments but the last one, so the mean is O(1).
+    - The segments that could still be the maximum are kept in a second deque in decreasing order,
+      so the maximum is also O(1) (amortized).
+    - The Var only holds a weak reference to the VarWindow, so the VarWindow is freed (and unsubscribed)
+      once nothing else refers to it. close() unsubscribes it right away.
+
+    Parameters
+    -----------
+
+    var : Var
+        The variable to aggregate. Its value must be a number.
+
+    window_period : float
+        The length of the window in seconds.
+
+    '''
+
+    def __init__(self, var: Var, window_period: float):
+
+        if not isinstance(var, Var):
+            raise TypeError("var must be of type Var!")
+        if window_period <= 0:
+            raise ValueError("window_period must be positive!")
+
+        self.var = var
+        self.window_period = window_period
+        self.lock = threading.Lock()
+
+        # segments of constant value --- (start time, value); the first one may start before the window
+        self.segments = deque()
+        self.first_seq = 0
+
+        # sum of value * duration of all the segments except the last one
+        self.area = 0.0
+
+        # segments that could be the maximum --- (sequence number, value) in decreasing value
+        self.max_candidates = deque()
+
+        with self.lock:
+            self.__append_segment(perf_counter(), var.val)
+
+        callback = _weak_notify_changed(self)
+        var.subscribe(callback)
+        self.__unsubscribe = weakref.finalize(self, var.unsubscribe, callback)
+
+    def notify_changed(self, var):
+        with self.lock:
+            self.__append_segment(perf_counter(), var.val)
+
+    def mean(self):
+
+        with self.lock:
+            now = perf_counter()
+            self.__expire(now)
+
+            first_t, first_val = self.segments[0]
+            last_t, last_val = self.segments[-1]
+
+            # the window is shorter at the start, before there is window_period worth of history
+            window_start = max(now - self.window_period, first_t)
+            duration = now - window_start
+            if duration <= 0:
+                return last_val
+
+            area = self.area + last_val*(now - last_t) - first_val*(window_start - first_t)
+            return area/duration
+
+    def max(self):
+
+        with self.lock:
+            self.__expire(perf_counter())
+            return self.max_candidates[0][1]
+
+    def close(self):
+        self.__unsubscribe()
+
+    def __append_segment(self, t, value):
+
+        if self.segments:
+            last_t, last_val = self.segments[-1]
+            self.area += last_val*(t - last_t)
+        self.segments.append((t, value))
+        seq = self.first_seq + len(self.segments) - 1
+
+        while self.max_candidates and self.max_candidates[-1][1] <= value:
+            self.max_candidates.pop()
+        self.max_candidates.append((seq, value))
+
+        self.__expire(t)
+
+    def __expire(self, now):
+
+        window_start = now - self.window_period
+
+        # drop the segments that ended before the window started
+        while len(self.segments) > 1 and self.segments[1][0] <= window_start:
+            t0, val0 = self.segments.popleft()
+            self.area -= val0*(self.segments[0][0] - t0)
+            self.first_seq += 1
+
+        while self.max_candidates[0][0] < self.first_seq:
+            self.max_candidates.popleft()
+
+        # the running sum is exact again when only one segment is left
+        if len(self.segments) == 1:
+            self.area = 0.0
+
+
+def _weak_notify_changed(window: VarWindow):
+
+    window_ref = weakref.ref(window)
+
+    def notify_changed(var):
+        window = window_ref()
+        if window is not None:
+            window.notify_changed(var)
+
+    return notify_changed
+
+
+# Var --> {window_period: VarWindow}; Vars that are linked together share their VarWindows
+# Both are weak references, so the VarWindows that are no longer used are freed
+_var_windows = weakref.WeakKeyDictionary()
+_var_windows_lock = threading.Lock()
+
+
+def get_var_window(var: Var, window_period: float) -> VarWindow:
+    '''Returns the VarWindow of var with window_period, creating it the first time it is needed'''
+
+    with _var_windows_lock:
+        windows = _var_windows.setdefault(var, weakref.WeakValueDictionary())
+        window = windows.get(window_period)
+        if window is None:
+            window = VarWindow(var, window_period)
+            windows[window_period] = window
+        return window
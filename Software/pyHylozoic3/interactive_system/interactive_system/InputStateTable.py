@@ -0,0 +1,100 @@
+'''Array-backed table of the input states of a Teensy.'''
+
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from multiprocessing.sharedctypes import RawArray
+
+
+class InputStateTable(MutableMapping):
+
+    """
+    InputStateTable stores the input states of a Teensy in one preallocated shared-memory array.
+
+    - It can be used like the dict of input states that it replaces.
+    - The index of each input state is fixed, so readers can resolve it once with get_index and then
+      read values[index] directly without any string look-up or copying.
+    - The input states of a reply type are stored next to each other so that a reply is written with
+      a single slice assignment.
+    - The array can be passed to other processes (see TeensyShard).
+    """
+
+    # type code of the array; all input states are integers
+    type_code = 'l'
+
+    def __init__(self, names, init_val=0):
+
+        # input state --> index in the array
+        self.index = OrderedDict()
+        for name in names:
+            if name not in self.index:
+                self.index[name] = len(self.index)
+
+        self.values = RawArray(self.type_code, len(self.index))
+        for i in range(len(self.index)):
+            self.values[i] = init_val
+
+        # tuple of input states --> index of the first one in the array
+        self.__blocks = dict()
+
+    def get_index(self, name):
+        try:
+            return self.index[name]
+        except KeyError:
+            raise KeyError(name + " does not exist!")
+
+    def set_block(self, names, block_values):
+
+        # resolve the position of the block the first time
+        try:
+            start = self.__blocks[names]
+        except KeyError:
+            start = self.__find_block(names)
+            self.__blocks[names] = start
+
+        if start is None:
+            for name, value in zip(names, block_values):
+                self.values[self.index[name]] = value
+        else:
+            self.values[start:start + len(names)] = block_values
+
+    def attach(self, values):
+        """Use an existing array (e.g. one created by another process) to store the input states."""
+
+        if len(values) != len(self.values):
+            raise ValueError("The array must have %d elements." % len(self.values))
+
+        values[:] = self.values[:]
+        self.values = values
+
+    def __find_block(self, names):
+
+        # the block can only be written with one slice if the input states are next to each other
+        start = self.index[names[0]]
+        for i, name in enumerate(names):
+            if self.index[name] != start + i:
+                return None
+        return start
+
+    def __getitem__(self, name):
+        return self.values[self.index[name]]
+
+    def __setitem__(self, name, value):
+        try:
+            self.values[self.index[name]] = value
+        except KeyError:
+            raise KeyError("Input state table has a fixed set of input states. %s does not exist!" % name)
+
+    def __delitem__(self, name):
+        raise TypeError("Input states cannot be removed from the table.")
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __repr__(self):
+        return repr(dict(self.items()))
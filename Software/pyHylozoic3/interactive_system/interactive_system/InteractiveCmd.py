@@ -7,12 +7,16 @@ import inspect
 
 class InteractiveCmd(threading.Thread):
 
-    def __init__(self, Teensy_manager, auto_start=True):
+    def __init__(self, Teensy_manager, auto_start=True, batched=False):
 
         # command queue
         self.cmd_q = queue.Queue()
         self.teensy_manager = Teensy_manager
 
+        # in batched mode, all change requests for a Teensy are sent as one burst of messages
+        # instead of one round trip per request type
+        self.batched = batched
+
         # semaphore for restricting only one thread to access this thread at any given time
         self.lock = threading.Lock()
 
@@ -154,6 +158,15 @@ class InteractiveCmd(threading.Thread):
                 cmd_obj_qs[cmd_by_type.teensy_name] = queue.Queue()
                 cmd_obj_qs[cmd_by_type.teensy_name].put_nowait(copy(cmd_by_type))
 
+        # queue up the bursts of all Teensy first so that the Teensy threads send them concurrently
+        if self.batched:
+            for teensy_name, cmd_obj_q in cmd_obj_qs.items():
+                cmd_objs = []
+                while not cmd_obj_q.empty():
+                    cmd_objs.append(cmd_obj_q.get_nowait())
+                self.apply_change_requests(teensy_name, cmd_objs)
+            return
+
         # send them out one Teensy by one Teensy
         while len(cmd_obj_qs) > 0:
             cmd_obj_lists_copy = copy(cmd_obj_qs)
@@ -180,16 +193,7 @@ class InteractiveCmd(threading.Thread):
             #teensy_thread.lock_received = False
             teensy_thread.inputs_sampled_event.clear()
 
-            request_type = teensy_thread.param.set_request_type(cmd_obj.change_request_type)
-            teensy_thread.param.set_msg_setting(cmd_obj.msg_setting)
-
-            #cmd_obj.print()
-            for param_type, param_val in cmd_obj.change_request.items():
-                y = teensy_thread.param.set_output_param(param_type, param_val)
-                if y == 1:
-                    print(param_type, " is not a ", request_type, " request. Change request did not apply.")
-                elif y == -1:
-                    print("Request Type ", request_type, " does not exist! Change request did not apply.")
+            self.__set_change_request(teensy_thread, cmd_obj)
             #print("set event updated")
             teensy_thread.param_updated_event.set()
             #print(">>>>> sent command to Teensy #" + cmd_obj.teensy_name)
@@ -203,6 +207,40 @@ class InteractiveCmd(threading.Thread):
 
         return 0
 
+    def apply_change_requests(self, teensy_name, cmd_objs):
+
+        # queue a message for each change request; the Teensy thread sends them back-to-back
+        # without waiting for the Teensy thread to pick them up
+        teensy_thread = self.teensy_manager.get_teensy_thread(teensy_name)
+        if teensy_thread is None:
+            print(teensy_name + " does not exist!")
+            return -1
+
+        with teensy_thread.lock:
+
+            teensy_thread.inputs_sampled_event.clear()
+
+            for cmd_obj in cmd_objs:
+                self.__set_change_request(teensy_thread, cmd_obj)
+                teensy_thread.queue_msg()
+
+            teensy_thread.param_updated_event.set()
+
+        return 0
+
+    def __set_change_request(self, teensy_thread, cmd_obj):
+
+        request_type = teensy_thread.param.set_request_type(cmd_obj.change_request_type)
+        teensy_thread.param.set_msg_setting(cmd_obj.msg_setting)
+
+        #cmd_obj.print()
+        for param_type, param_val in cmd_obj.change_request.items():
+            y = teensy_thread.param.set_output_param(param_type, param_val)
+            if y == 1:
+                print(param_type, " is not a ", request_type, " request. Change request did not apply.")
+            elif y == -1:
+                print("Request Type ", request_type, " does not exist! Change request did not apply.")
+
     def update_input_states(self, teensy_names):
         for teensy_name in teensy_names:
             teensy_thread = self.teensy_manager.get_teensy_thread(teensy_name)
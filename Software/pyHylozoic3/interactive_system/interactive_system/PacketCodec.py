@@ -0,0 +1,126 @@
+'''Precompiled byte layouts for composing and parsing the messages exchanged with the Teensy.'''
+
+import struct
+
+from .InputStateTable import InputStateTable
+
+
+class PacketCodec(object):
+
+    """
+    PacketCodec compiles the byte layout of each request type and reply type into a single struct.Struct.
+
+    - Outgoing messages are packed into one reused bytearray with a single pack_into call.
+    - Incoming messages are unpacked with a single unpack_from call per reply.
+    - Byte 0 and the last byte are the message signature, byte 1 is the request/reply type
+      and the second last byte is the message setting. The variables fill the bytes in between.
+    """
+
+    # struct format of each variable type in the protocol config files
+    var_type_fmts = {'bool': '?', 'int8': 'B', 'int16': 'H', 'sint8': 'b', 'sint16': 'h', 'int8s': 's'}
+
+    def __init__(self, msg_length=64):
+
+        self.msg_length = msg_length
+
+        # the buffer that all outgoing messages are packed into
+        self.buffer = bytearray(msg_length)
+
+        # request_type --> (struct, request_type_id, var_names, indices of the array variables)
+        self.request_codecs = dict()
+
+        # reply_type_id --> (struct, var_names)
+        self.reply_codecs = dict()
+
+    def add_request_layout(self, request_type, request_type_id, fields):
+        """
+        Compile the layout of a request type.
+        fields is an iterable of (var_name, byte_offset, struct_fmt), where byte_offset is counted from byte 0.
+        """
+
+        body_fmt, var_names, array_idx = self.__compile_fields(fields, self.msg_length - 2)
+
+        # pad the end of the content up to the message setting byte
+        body_size = struct.calcsize('<BB' + body_fmt)
+        if body_size < self.msg_length - 2:
+            body_fmt += '%dx' % (self.msg_length - 2 - body_size)
+
+        layout = struct.Struct('<BB' + body_fmt + 'BB')
+        self.request_codecs[request_type] = (layout, int(request_type_id), var_names, array_idx)
+
+    def add_reply_layout(self, reply_type_id, fields):
+        """
+        Compile the layout of a reply type.
+        fields is an iterable of (var_name, byte_offset, struct_fmt), where byte_offset is counted from byte 0.
+        """
+
+        body_fmt, var_names, array_idx = self.__compile_fields(fields, self.msg_length - 1)
+
+        layout = struct.Struct('<2x' + body_fmt)
+        self.reply_codecs[int(reply_type_id)] = (layout, var_names)
+
+    def has_request_layout(self, request_type):
+        return request_type in self.request_codecs
+
+    def has_reply_layout(self, reply_type_id):
+        return reply_type_id in self.reply_codecs
+
+    def pack_request(self, request_type, output_param, msg_setting=0):
+
+        layout, request_type_id, var_names, array_idx = self.request_codecs[request_type]
+
+        # byte 0 and the last byte are the msg signature; left as 0 for now
+        values = [0, request_type_id]
+        values.extend([output_param[name] for name in var_names])
+        for i in array_idx:
+            values[i + 2] = bytes(values[i + 2])
+        values.append(msg_setting)
+        values.append(0)
+
+        layout.pack_into(self.buffer, 0, *values)
+
+        return self.buffer
+
+    def unpack_reply(self, msg, input_state):
+
+        # byte 1: reply type
+        try:
+            layout, var_names = self.reply_codecs[msg[1]]
+        except KeyError:
+            return False
+
+        if isinstance(input_state, InputStateTable):
+            input_state.set_block(var_names, layout.unpack_from(msg))
+        else:
+            input_state.update(zip(var_names, layout.unpack_from(msg)))
+        return True
+
+    @staticmethod
+    def __compile_fields(fields, end_byte):
+
+        body_fmt = ''
+        var_names = []
+        array_idx = []
+
+        # variables start right after the header
+        next_byte = 2
+        for name, byte_offset, var_fmt in sorted(fields, key=lambda field: field[1]):
+
+            if byte_offset < next_byte:
+                raise ValueError("%s (byte %d) overlaps with the header or the previous variable." % (name, byte_offset))
+
+            # fill the gap with pad bytes
+            if byte_offset > next_byte:
+                body_fmt += '%dx' % (byte_offset - next_byte)
+
+            if var_fmt.endswith('s'):
+                array_idx.append(len(var_names))
+
+            body_fmt += var_fmt
+            var_names.append(name)
+            next_byte = byte_offset + struct.calcsize('<' + var_fmt)
+
+        if next_byte > end_byte:
+            raise ValueError("Variables exceed the content of the message (byte %d > %d)." % (next_byte, end_byte))
+
+        return body_fmt, tuple(var_names), tuple(array_idx)
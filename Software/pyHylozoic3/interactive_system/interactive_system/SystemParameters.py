@@ -3,12 +3,15 @@ import re
 import copy
 import os
 import pkg_resources
+from collections import defaultdict
+
+from .PacketCodec import PacketCodec
+from .InputStateTable import InputStateTable
 
 class SystemParameters():
 
     msg_length = 64
 
-
     def __init__(self):
 
         #==== outputs ====
@@ -30,6 +33,8 @@ class SystemParameters():
         self.var_encode_func["bool"] = self._set_bool_var
         self.var_encode_func["int8"] = self._set_int8_var
         self.var_encode_func["int16"] = self._set_int_var
+        self.var_encode_func["sint8"] = self._set_sint8_var
+        self.var_encode_func["sint16"] = self._set_sint_var
 
         #==== inputs ====
         self.input_state = dict()
@@ -45,6 +50,16 @@ class SystemParameters():
         self.request_type_ids['read_only'] = 255
         self.request_type = 'basic'
 
+        #=== byte layout ====
+        # byte offsets of the variables in each request type --- {request_type: [(var_name, byte_offset), ...]}
+        # the struct format of each variable is determined by its type in the output config file
+        # request types with variables that have no byte offset are composed by _compose_outgoing_msg instead
+        self.output_layout = defaultdict(list)
+        self.output_layout['prgm'].append(('program_teensy', 2))
+
+        # byte offsets of the variables in each reply type --- {reply_type_id: [(var_name, byte_offset, struct_fmt), ...]}
+        self.input_layout = defaultdict(list)
+
         #=== reply type ====
         self.reply_types = dict()
         self.reply_types[0] = set()
@@ -59,6 +74,12 @@ class SystemParameters():
 
         self.additional_config_routine()
 
+        # compile the byte layouts of the messages
+        self._compile_layouts()
+
+        # store the input states in an array
+        self._build_input_state_table()
+
 
     def additional_config_routine(self):
         self._import_param_from_file()
@@ -84,7 +105,9 @@ class SystemParameters():
             for line in param_config:
                 entry = re.split('\W*', line)
                 try:
-                    if len(entry) != 5:
+                    # name, type, request type, request type id, initial value
+                    # [, byte offset [, other request type, byte offset in that request type, ...]]
+                    if len(entry) != 5 and (len(entry) < 6 or len(entry) % 2 != 0):
                         raise Exception("Invalid configuration at line -> " + line)
                 except Exception as e:
                     print(e)
@@ -95,6 +118,12 @@ class SystemParameters():
                     req_type_id = entry[3]
                     init_val = entry[4]
 
+                    # add the variable to the byte layouts
+                    if len(entry) > 5:
+                        self.output_layout[req_type].append((name, int(entry[5])))
+                        for i in range(6, len(entry), 2):
+                            self.output_layout[entry[i]].append((name, int(entry[i+1])))
+
                     # add name to the variable list
                     if var_type not in self.var_list.keys():
                         self.var_list[var_type] = {name, }
@@ -126,14 +155,21 @@ class SystemParameters():
             for line in param_config:
                 entry = re.split('\W*', line)
                 try:
-                    if len(entry) != 2:
+                    # name, reply type id [, byte offset, type]
+                    if len(entry) != 2 and len(entry) != 4:
                         raise Exception("Invalid configuration at line -> " + line)
+                    if len(entry) == 4 and entry[3] not in PacketCodec.var_type_fmts:
+                        raise Exception("Invalid variable type at line -> " + line)
                 except Exception as e:
                     print(e)
                 else:
                     name = entry[0]
                     rep_type = entry[1]
 
+                    # add the variable to the byte layout
+                    if len(entry) == 4:
+                        self.input_layout[int(rep_type)].append((name, int(entry[2]), PacketCodec.var_type_fmts[entry[3]]))
+
                     # add name to the variable list
                     if rep_type not in self.reply_types.keys():
                         self.reply_types[rep_type] = {name, }
@@ -144,6 +180,63 @@ class SystemParameters():
 
         # print("Input parameters: ", list(self.input_state.keys()))
 
+    def _compile_layouts(self):
+
+        self.codec = PacketCodec(SystemParameters.msg_length)
+
+        for request_type, request_type_id in self.request_type_ids.items():
+
+            # only compile the request types with a byte offset for all of their variables
+            layout = self.output_layout.get(request_type, ())
+            if not self.request_types.get(request_type, set()) <= {name for name, _ in layout}:
+                continue
+
+            fields = []
+            for name, byte_offset in layout:
+                fields.append((name, byte_offset, self.__get_var_fmt(name)))
+
+            self.codec.add_request_layout(request_type, request_type_id, fields)
+
+        for reply_type, layout in self.input_layout.items():
+
+            # only compile the reply types with a byte offset for all of their variables
+            if not self.reply_types.get(str(reply_type), set()) <= {name for name, _, _ in layout}:
+                continue
+
+            self.codec.add_reply_layout(reply_type, layout)
+
+    def _build_input_state_table(self):
+
+        # the input states of each reply type are stored next to each other
+        names = []
+        for reply_type_id in sorted(self.codec.reply_codecs.keys()):
+            names.extend(self.codec.reply_codecs[reply_type_id][1])
+        names.extend(self.input_state.keys())
+
+        input_state_table = InputStateTable(names)
+        for name, value in self.input_state.items():
+            input_state_table[name] = value
+        self.input_state = input_state_table
+
+    def __get_var_fmt(self, var):
+
+        for var_type, vars in self.var_list.items():
+            if var in vars:
+                break
+        else:
+            raise ValueError(var + " does not exist!")
+
+        try:
+            var_fmt = PacketCodec.var_type_fmts[var_type]
+        except KeyError:
+            raise KeyError("There isn't any struct format for " + str(var_type))
+
+        # arrays are packed as a string of bytes of their initial length
+        if var_fmt == 's':
+            var_fmt = '%ds' % len(self.output_param[var])
+
+        return var_fmt
+
     def get_input_state(self, state_type):
         if isinstance(state_type, str):
             if state_type in self.input_state:
@@ -205,6 +298,22 @@ class SystemParameters():
     def _set_int8_var(self, input_type, input):
         self._set_int_var(input_type, input, 8)
 
+    def _set_sint_var(self, input_type, input, num_bit=16):
+
+        if not isinstance(input, int):
+            try:
+                input = int(input)
+            except ValueError:
+                raise TypeError(input_type + " must be an integer.")
+
+        if input > 2**(num_bit-1) - 1 or input < -2**(num_bit-1):
+            raise TypeError(input_type + " must be between " + str(-2**(num_bit-1)) + " and "
+                            + str(2**(num_bit-1) - 1) + "." + "[value = %s]" % str(input))
+        self.output_param[input_type] = input
+
+    def _set_sint8_var(self, input_type, input):
+        self._set_sint_var(input_type, input, 8)
+
     def _set_bool_var(self, input_type, input):
 
         if isinstance(input, bool):
@@ -238,9 +347,14 @@ class SystemParameters():
         # byte 1: reply type
         self.reply_type = msg[1]
 
+        self.codec.unpack_reply(msg, self.input_state)
 
     def compose_message_content(self):
 
+        # use the precompiled layout if there is one for this request type
+        if self.codec.has_request_layout(self.request_type):
+            return self.codec.pack_request(self.request_type, self.output_param, self.msg_setting)
+
         # byte 0 and byte 63: the msg signature; left as 0 for now
         signature_front = bytearray(chr(0), 'utf-8')
         signature_back = bytearray(chr(0), 'utf-8')
@@ -0,0 +1,251 @@
+'''Worker processes that run the USB I/O of a subset of the Teensy devices.'''
+
+import threading
+import multiprocessing
+from copy import copy
+from collections import OrderedDict
+
+from .TeensyInterface import TeensyInterface, _LinkedEvent
+from .InputStateTable import InputStateTable
+
+
+class TeensyShard():
+
+    """
+    TeensyShard runs the TeensyInterface threads of a subset of the Teensy devices in a worker process.
+
+    - The main process holds a TeensyProxy for each Teensy device, which has the same interface as TeensyInterface.
+    - Only the output parameters that changed are sent to the worker process.
+    - The input state tables are shared with the worker process, which writes the replies into them directly.
+      Only a notification is sent back to the main process.
+    - The lock of each TeensyProxy is shared with the worker process, which holds it while it writes a reply
+      into the table, so the main process never reads a table that is half-written.
+    """
+
+    def __init__(self, teensy_list, print_to_term=False):
+
+        # event is set when the parameters of any of the proxies are updated
+        self.wakeup_event = threading.Event()
+
+        # teensy_list --- [(teensy_name, serial_num, protocol_class), ...]
+        self.teensy_proxies = OrderedDict()
+        # teensy_name --> (array of the input state table, lock of the proxy)
+        shared_input_states = dict()
+        for teensy_name, serial_num, protocol_class in teensy_list:
+            teensy_proxy = TeensyProxy(self, serial_num, protocol_class())
+            self.teensy_proxies[teensy_name] = teensy_proxy
+            if isinstance(teensy_proxy.param.input_state, InputStateTable):
+                shared_input_states[teensy_name] = (teensy_proxy.param.input_state.values, teensy_proxy.lock)
+
+        self.conn, worker_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_run_teensy_shard,
+                                               args=(worker_conn, teensy_list, shared_input_states, print_to_term),
+                                               name='Teensy_Shard', daemon=True)
+        self.process.start()
+
+        # wait until the worker process is connected to its Teensy
+        active_teensy = self.conn.recv()
+        for teensy_name in list(self.teensy_proxies.keys()):
+            if teensy_name not in active_teensy:
+                self.teensy_proxies[teensy_name].killed = True
+
+        self.sender_thread = threading.Thread(target=self.send_output_params, daemon=True, name='Teensy_Shard_Sender')
+        self.receiver_thread = threading.Thread(target=self.receive_input_states, daemon=True, name='Teensy_Shard_Receiver')
+        self.sender_thread.start()
+        self.receiver_thread.start()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def send_output_params(self):
+
+        while self.process.is_alive():
+
+            self.wakeup_event.wait(timeout=1)
+            self.wakeup_event.clear()
+
+            # collect the change requests of the proxies with updated parameters
+            out_deltas = []
+            for teensy_name, teensy_proxy in self.teensy_proxies.items():
+                if not teensy_proxy.param_updated_event.is_set():
+                    continue
+                teensy_proxy.param_updated_event.clear()
+
+                with teensy_proxy.lock:
+                    teensy_proxy.lock_received_event.set()
+                    if not teensy_proxy.out_deltas:
+                        teensy_proxy.queue_msg()
+                    for out_delta in teensy_proxy.out_deltas:
+                        out_deltas.append((teensy_name,) + out_delta)
+                    teensy_proxy.out_deltas = []
+
+            if out_deltas:
+                try:
+                    self.conn.send(out_deltas)
+                except (EOFError, OSError):
+                    break
+
+    def receive_input_states(self):
+
+        while True:
+            try:
+                in_deltas = self.conn.recv()
+            except (EOFError, OSError):
+                break
+
+            for teensy_name, input_states, killed in in_deltas:
+                teensy_proxy = self.teensy_proxies[teensy_name]
+                with teensy_proxy.lock:
+                    teensy_proxy.param.input_state.update(input_states)
+                    teensy_proxy.inputs_sampled_event.set()
+                teensy_proxy.killed = killed
+
+        for teensy_proxy in self.teensy_proxies.values():
+            teensy_proxy.killed = True
+
+
+class TeensyProxy():
+
+    """
+    TeensyProxy stands in for the TeensyInterface of a Teensy device that is run by a TeensyShard.
+    """
+
+    def __init__(self, shard, serial_num, protocol):
+
+        self.shard = shard
+        self.serial_number = serial_num
+        self.param = protocol
+        self.killed = False
+
+        self.param_updated_event = _LinkedEvent(shard.wakeup_event)
+        self.inputs_sampled_event = threading.Event()
+        self.lock_received_event = threading.Event()
+
+        # also held by the worker process while it writes a reply into the shared input state table
+        self.lock = multiprocessing.Lock()
+
+        # change requests waiting to be sent --- [(request_type, msg_setting, changed output parameters), ...]
+        self.out_deltas = []
+
+        # the values of the output parameters last sent to the worker process
+        self.sent_output_param = dict()
+
+    def is_alive(self):
+        return not self.killed and self.shard.is_alive()
+
+    def queue_msg(self):
+        """
+        Add the current request to the change requests waiting to be sent.
+        The lock must be held by the caller.
+        """
+
+        request_type = self.param.request_type
+
+        output_params = dict()
+        for var in self.param.request_types.get(request_type, ()):
+            value = self.param.output_param[var]
+            if self.sent_output_param.get(var) != value:
+                output_params[var] = copy(value)
+        self.sent_output_param.update(output_params)
+
+        self.out_deltas.append((request_type, self.param.msg_setting, output_params))
+
+
+def _run_teensy_shard(conn, teensy_list, shared_input_states, print_to_term):
+
+    teensy_threads = OrderedDict()
+    for teensy_name, serial_num, protocol_class in teensy_list:
+        protocol = protocol_class()
+
+        # write the input states directly into the table shared with the main process
+        if teensy_name in shared_input_states:
+            values, table_lock = shared_input_states[teensy_name]
+            protocol.input_state.attach(values)
+            _lock_parsing(protocol, table_lock)
+
+        try:
+            teensy_threads[teensy_name] = TeensyInterface(serial_num, protocol=protocol, print_to_term=print_to_term)
+        except Exception as e:
+            print(teensy_name, ": ", e)
+    conn.send(list(teensy_threads.keys()))
+
+    # event is set when any of the Teensy threads updated its input parameters
+    inputs_sampled_event = threading.Event()
+    for teensy_thread in teensy_threads.values():
+        teensy_thread.inputs_sampled_event = _LinkedEvent(inputs_sampled_event)
+
+    reporter_thread = threading.Thread(target=_report_input_states,
+                                       args=(conn, teensy_threads, set(shared_input_states.keys()), inputs_sampled_event),
+                                       daemon=True, name='Teensy_Shard_Reporter')
+    reporter_thread.start()
+
+    while True:
+        try:
+            out_deltas = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        for teensy_name, request_type, msg_setting, output_params in out_deltas:
+            teensy_thread = teensy_threads.get(teensy_name)
+            if teensy_thread is None:
+                continue
+
+            with teensy_thread.lock:
+                teensy_thread.param.set_request_type(request_type)
+                teensy_thread.param.set_msg_setting(msg_setting)
+                for param_type, param_val in output_params.items():
+                    teensy_thread.param.set_output_param(param_type, param_val)
+                teensy_thread.queue_msg()
+                teensy_thread.param_updated_event.set()
+
+
+def _lock_parsing(protocol, table_lock):
+    '''Make the protocol hold table_lock while it parses a reply into the shared input state table'''
+
+    parse_message_content = protocol.parse_message_content
+
+    def locked_parse_message_content(msg):
+        with table_lock:
+            parse_message_content(msg)
+
+    protocol.parse_message_content = locked_parse_message_content
+
+
+def _report_input_states(conn, teensy_threads, shared_teensy, inputs_sampled_event):
+
+    # the values of the input states last sent to the main process
+    sent_input_states = dict()
+
+    while True:
+
+        inputs_sampled_event.wait(timeout=1)
+        inputs_sampled_event.clear()
+
+        in_deltas = []
+        for teensy_name, teensy_thread in teensy_threads.items():
+
+            if not teensy_thread.inputs_sampled_event.is_set() and not teensy_thread.killed:
+                continue
+
+            sent = sent_input_states.setdefault(teensy_name, dict())
+            with teensy_thread.lock:
+                teensy_thread.inputs_sampled_event.clear()
+                input_states = dict()
+                # the main process reads the shared input state table directly
+                if teensy_name not in shared_teensy:
+                    for input_type, value in teensy_thread.param.input_state.items():
+                        if sent.get(input_type) != value:
+                            input_states[input_type] = value
+            sent.update(input_states)
+
+            in_deltas.append((teensy_name, input_states, teensy_thread.killed))
+
+        for teensy_name, input_states, killed in in_deltas:
+            if killed:
+                del teensy_threads[teensy_name]
+
+        if in_deltas:
+            try:
+                conn.send(in_deltas)
+            except (EOFError, OSError):
+                break
@@ -1,5 +1,7 @@
 from .TeensyInterface import TeensyManager
 from .SystemParameters import SystemParameters
+from .PacketCodec import PacketCodec
+from .InputStateTable import InputStateTable
 from .InteractiveCmd import *
 from .CommunicationProtocol import *
 from .Messenger import *
@@ -0,0 +1,83 @@
+'''Tests of TeensyEventLoop with fake Teensy devices (no USB hardware needed)'''
+
+import queue
+import threading
+import unittest
+from time import perf_counter, sleep
+
+from interactive_system.TeensyInterface import TeensyDevice, TeensyEventLoop, _LinkedEvent
+
+
+class FakeParam(object):
+
+    def __init__(self):
+        self.num_parsed = 0
+
+    def parse_message_content(self, data):
+        self.num_parsed += 1
+
+
+class FakeDevice(TeensyDevice):
+
+    """TeensyDevice that echoes every message it is sent, as a Teensy replies with the signature of the message"""
+
+    def __init__(self, event_loop):
+
+        self.serial_number = 'fake'
+        self.killed = False
+        self.no_reply_counter = 0
+        self.invalid_reply_counter = 0
+        self.print_to_term_enabled = False
+
+        self.lock = threading.Lock()
+        self.lock_received_event = threading.Event()
+        self.inputs_sampled_event = threading.Event()
+        self.out_msg_q = queue.Queue()
+        self.param = FakeParam()
+
+        self.send_times = []
+        self.reply = None
+
+        self.event_loop = event_loop
+        self.param_updated_event = _LinkedEvent(event_loop.wakeup_event)
+        event_loop.add_device(self)
+
+    def talk_to_Teensy(self, out_msg, timeout=10):
+        self.send_times.append(perf_counter())
+        self.reply = bytearray(out_msg)
+
+    def listen_to_Teensy(self, timeout=100, byte_num=64):
+        reply, self.reply = self.reply, None
+        if reply is None:
+            sleep(timeout / 1000)
+        return reply
+
+
+class TestTeensyEventLoop(unittest.TestCase):
+
+    def test_batch_is_sent_back_to_back(self):
+
+        event_loop = TeensyEventLoop()
+        device = FakeDevice(event_loop)
+
+        # a batch of messages queued by a batched change request, as in apply_change_requests
+        num_msgs = 5
+        with device.lock:
+            for i in range(num_msgs):
+                device.out_msg_q.put_nowait((bytearray([i + 1] * 64), i + 1, i + 1))
+        start_time = perf_counter()
+        device.param_updated_event.set()
+
+        # only one wakeup; without it, the loop would wait up to 1 s between the messages
+        deadline = start_time + 0.5
+        while device.param.num_parsed < num_msgs and perf_counter() < deadline:
+            sleep(0.01)
+
+        self.assertEqual(device.param.num_parsed, num_msgs)
+        self.assertLess(device.send_times[-1] - start_time, 0.5)
+
+        device.killed = True
+
+
+if __name__ == '__main__':
+    unittest.main()